@@ -1,10 +1,13 @@
 from flask import Flask
+import click
 from flask_cors import CORS
-from models import db, User
+from models import db, User, University, Class, ClassGroup, Tag, Discussion, Reply
+from migrations import upgrade_schema
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 import os
 import logging
+import threading
 from routes.discussion import discussion_bp
 from routes.tags import tags_bp
 from routes.reply import reply_bp
@@ -12,20 +15,59 @@ from routes.university import university_bp
 from routes.user import user_bp
 from routes.classes import class_bp
 from flask_smorest import Api
+from marshmallow.fields import Nested, Pluck
 from routes.class_groups import class_group_bp
+from routes.search import search_bp
+from routes.cache import cache_bp
+from services.grouping_service import rebuild_group_index, group_index_stale
+from services.regroup_service import regroup_all
+from services.grouping_queue import GroupingWorker, reset_stale_jobs
+from services.search_service import install_search_index, rebuild_search_index
+from services.counter_service import repair_counters, TRIGGER_WRITES
+from services.import_service import import_classes, IMPORT_FORMATS
+from services.export_service import export_discussions
+from utils.query_budget import install_query_budget, QueryBudgetExceeded
+from utils.fieldsets import install_fieldset_guard
+from utils.table_versions import install_table_versions
+from utils.sqlite_profile import apply_pragmas, engine_config
+from utils.index_advisor import capture_selects, explain, plan_findings
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Pagination", "ETag"])
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Database config - MUST be set BEFORE db.init_app()
-db_path = os.path.join(os.path.dirname(__file__), "database", "universe.db")
+db_path = os.environ.get("DATABASE_PATH", os.path.join(os.path.dirname(__file__), "database", "universe.db"))
 os.makedirs(os.path.dirname(db_path), exist_ok=True)
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# SQLite tuning: "default" (SQLite's defaults) or "production" (WAL, synchronous=NORMAL,
+# busy_timeout, mmap and a larger page cache; GET requests read from a pool of read-only
+# connections and all writes go through one writer connection)
+app.config["SQLITE_PROFILE"] = os.environ.get("SQLITE_PROFILE", "default")
+app.config["SQLITE_READ_POOL"] = int(os.environ.get("SQLITE_READ_POOL", 4))
+app.config.update(engine_config(app.config["SQLITE_PROFILE"], db_path, app.config["SQLITE_READ_POOL"]))
+
+# Class grouping engine: "exact" (token postings + Jaccard) or "minhash" (banded LSH + Jaccard)
+app.config["GROUPING_ENGINE"] = os.environ.get("GROUPING_ENGINE", "exact")
+app.config["GROUPING_LSH_BANDS"] = int(os.environ.get("GROUPING_LSH_BANDS", 20))
+app.config["GROUPING_LSH_ROWS"] = int(os.environ.get("GROUPING_LSH_ROWS", 3))
+# Group classes on a background worker after the response (off: drain the queue inline)
+app.config["GROUPING_ASYNC"] = os.environ.get("GROUPING_ASYNC", "1") == "1"
+# Processes used by bulk regrouping (flask regroup / POST /api/class-groups/regroup)
+app.config["REGROUP_WORKERS"] = int(os.environ.get("REGROUP_WORKERS", 1))
+# Per-request SQL statement budgets (@query_budget): "off", "warn" or "raise" (for test runs)
+app.config["QUERY_BUDGET"] = os.environ.get("QUERY_BUDGET", "off")
+# ETag / 304 on GET endpoints from in-process table versions (@conditional); turn off when
+# running more than one server process, since each only sees its own writes
+app.config["ETAGS"] = os.environ.get("ETAGS", "1") == "1"
+# In-process cache for the aggregate GET endpoints (@cached): byte budget (LRU) and default TTL in seconds
+app.config["RESPONSE_CACHE"] = os.environ.get("RESPONSE_CACHE", "1") == "1"
+app.config["RESPONSE_CACHE_BYTES"] = int(os.environ.get("RESPONSE_CACHE_BYTES", 8 * 1024 * 1024))
+app.config["RESPONSE_CACHE_TTL"] = int(os.environ.get("RESPONSE_CACHE_TTL", 60))
 
 # Smorest / OpenAPI config
 app.config["API_TITLE"] = "UniVerse API"
@@ -50,19 +92,281 @@ api.register_blueprint(reply_bp)
 api.register_blueprint(class_bp)
 api.register_blueprint(tags_bp)
 api.register_blueprint(class_group_bp)
+api.register_blueprint(search_bp)
+api.register_blueprint(cache_bp)
 
 
-# Without this, CASCADE deletes don't work
+# Without this, CASCADE deletes don't work (plus the SQLITE_PROFILE pragmas)
 @event.listens_for(Engine, "connect")
 def set_sqlite_pragma(dbapi_conn, connection_record):
-    cursor = dbapi_conn.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
+    apply_pragmas(dbapi_conn, app.config["SQLITE_PROFILE"])
 
 
-# Create tables if they don't exist
+# Create tables if they don't exist (and indexes added since)
 with app.app_context():
-    db.create_all()
+    if app.config["SQLITE_PROFILE"] == "production":
+        # persistent in the database file; set through the writer (read-only connections can't)
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    upgrade_schema()
+
+    # Backfill the group token/LSH index for older databases or changed LSH params
+    if group_index_stale():
+        logger.info("Indexed %d class groups", rebuild_group_index())
+
+    # Jobs left running by a previous process go back on the queue
+    reset_stale_jobs()
+
+    install_query_budget(app)
+    install_fieldset_guard(app)
+    install_table_versions(db.metadata, TRIGGER_WRITES)
+
+# The grouping worker starts with the first request, so CLI commands (which drain the
+# queue inline) and the reloader's watcher process don't each run one
+_worker_lock = threading.Lock()
+
+
+@app.before_request
+def start_grouping_worker():
+    if not app.config["GROUPING_ASYNC"] or "grouping_worker" in app.extensions:
+        return
+    with _worker_lock:
+        if "grouping_worker" not in app.extensions:
+            worker = GroupingWorker(app)
+            worker.start()
+            app.extensions["grouping_worker"] = worker
+
+
+@app.cli.command("regroup")
+@click.option("--threshold", type=click.FloatRange(0, 1, min_open=True), default=0.6, show_default=True, help="Minimum token Jaccard to join a group")
+@click.option("--workers", type=int, default=None, help="Worker processes (default: REGROUP_WORKERS)")
+def regroup_command(threshold, workers):
+    """Recluster every class into cross-university groups in one pass."""
+    stats = regroup_all(threshold, workers)
+    click.echo(
+        f"Regrouped {stats['classes']} classes into {stats['groups']} groups "
+        f"({stats['groups_created']} created, {stats['groups_removed']} removed, "
+        f"{stats['classes_moved']} classes moved) in {stats['seconds']}s"
+    )
+
+@app.cli.command("import-classes")
+@click.argument("source", type=click.File("rb"))
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS), default=None,
+              help="Input format (default: from the file extension; csv for stdin)")
+@click.option("--group/--no-group", default=True, show_default=True,
+              help="Group each chunk now, or queue the classes for the grouping worker")
+def import_classes_command(source, fmt, group):
+    """Bulk-create classes from a CSV or NDJSON file ("-" for stdin)."""
+    if fmt is None:
+        fmt = "ndjson" if source.name.endswith((".ndjson", ".jsonl")) else "csv"
+    result = import_classes(source, fmt, group=group)
+    for error in result["errors"]:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    if result["errors_truncated"]:
+        click.echo(f"... {result['failed'] - len(result['errors'])} more error(s)", err=True)
+    click.echo(
+        f"Imported {result['imported']} classes ({result['failed']} failed, {result['grouped']} grouped, "
+        f"{result['queued']} queued for grouping) in {result['seconds']}s"
+    )
+
+@app.cli.command("export-discussions")
+@click.option("--output", "-o", type=click.File("w"), default="-", show_default=True, help="NDJSON file to write")
+@click.option("--since", type=click.DateTime(["%Y-%m-%d", "%Y-%m-%dT%H:%M:%S"]), default=None,
+              help="Only discussions created at or after this UTC time")
+@click.option("--class-group-id", type=click.UUID, default=None)
+def export_discussions_command(output, since, class_group_id):
+    """Write every discussion with its replies as NDJSON, oldest first."""
+    count = 0
+    for line in export_discussions(since, class_group_id):
+        output.write(line)
+        count += 1
+    click.echo(f"Exported {count} discussions", err=True)
+
+@app.cli.command("search-reindex")
+def search_reindex_command():
+    """Rebuild the discussion/reply full-text indexes from the source tables."""
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+        rebuild_search_index(connection)
+    click.echo("Full-text search index rebuilt")
+
+@app.cli.command("repair-counters")
+def repair_counters_command():
+    """Recompute the denormalized count and discussion summary columns from the source tables."""
+    with db.engine.begin() as connection:
+        fixed = repair_counters(connection)
+    for counter, rows in fixed.items():
+        click.echo(f"{counter}: {rows} row(s) corrected")
+
+def _sample_get_requests():
+    """(rule, path) for every GET endpoint, path ids filled from the first row of the matching table.
+
+    Rules whose ids have no sample row are yielded with path None.
+    """
+    id_models = {
+        "user_id": User, "university_id": University, "class_id": Class, "group_id": ClassGroup,
+        "tag_id": Tag, "discussion_id": Discussion, "reply_id": Reply,
+    }
+    ids = {name: model.query.with_entities(model.id).limit(1).scalar() for name, model in id_models.items()}
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if "GET" not in rule.methods or rule.endpoint in ("static",) or rule.endpoint.startswith("api-docs"):
+            continue
+        if any(ids.get(arg) is None for arg in rule.arguments):
+            yield rule, None
+            continue
+        yield rule, app.url_map.bind("").build(rule.endpoint, {arg: ids[arg] for arg in rule.arguments})
+
+
+@app.cli.command("query-budgets")
+def query_budgets_command():
+    """Call every GET endpoint once and fail if any exceeds its query budget.
+
+    Needs QUERY_BUDGET=raise. Path ids are filled from the first row of the
+    matching table, so run it against a seeded database.
+    """
+    if app.config["QUERY_BUDGET"] != "raise":
+        raise click.UsageError("Run with QUERY_BUDGET=raise")
+
+    # testing mode: exceptions (QueryBudgetExceeded) reach the client instead of becoming a 500
+    app.testing = True
+    client = app.test_client()
+    failures = 0
+    for rule, path in _sample_get_requests():
+        if path is None:
+            click.echo(f"skip  {rule.rule} (no sample row)")
+            continue
+        view = app.view_functions[rule.endpoint]
+        budget = getattr(view, "_query_budget", (None,))[0]
+        # requests share the command's app context: start each with an empty session
+        db.session.remove()
+        try:
+            response = client.get(path, query_string={"q": "a"} if "search" in rule.rule else None)
+        except QueryBudgetExceeded as exc:
+            failures += 1
+            click.echo(f"FAIL  {path}\n{exc}")
+            continue
+        except Exception as exc:
+            failures += 1
+            click.echo(f"FAIL  {path}: {type(exc).__name__}: {exc}")
+            continue
+        if response.status_code >= 500:
+            failures += 1
+            click.echo(f"FAIL  {path}: HTTP {response.status_code}")
+            continue
+        count = response.headers.get("X-Query-Count")
+        click.echo(f"ok    {path}: {count} statement(s), budget {budget if budget is not None else '-'}")
+    if failures:
+        raise SystemExit(1)
+
+
+def _field_paths(schema, prefix=""):
+    """(name, selectable) for each field of ``schema``, dotted down nested ones.
+
+    Names under a Pluck are listed as not selectable: it dumps a plain value.
+    """
+    for name, field in schema.fields.items():
+        yield prefix + name, True
+        if isinstance(field, Pluck):
+            for sub in field.schema.fields:
+                yield f"{prefix}{name}.{sub}", False
+        elif isinstance(field, Nested):
+            yield from _field_paths(field.schema, f"{prefix}{name}.")
+
+
+@app.cli.command("fieldset-check")
+def fieldset_check_command():
+    """Call every sparse-fieldset GET endpoint with each field in fields= and exclude=.
+
+    Fields of the schema (nested ones included) must be accepted; names
+    under a Pluck and unknown names must be a 400, as must either argument
+    on API endpoints without sparse fieldsets. Run it against a seeded
+    database.
+    """
+    client = app.test_client()
+    failures = 0
+    for rule, path in _sample_get_requests():
+        schema = getattr(app.view_functions[rule.endpoint], "_sparse_fieldset", None)
+        if schema is None:
+            if path is not None and path.startswith("/api/"):
+                status = client.get(path, query_string={"fields": "id"}).status_code
+                if status != 400:
+                    failures += 1
+                    click.echo(f"FAIL  {path}?fields=id: HTTP {status}, expected 400 (no sparse fieldsets)")
+            continue
+        if path is None:
+            click.echo(f"skip  {rule.rule} (no sample row)")
+            continue
+        base = {"q": "a"} if "search" in rule.rule else {}
+        db.session.remove()
+        status = client.get(path, query_string=base).status_code
+        if status >= 400:
+            click.echo(f"skip  {path} (HTTP {status} without a selection)")
+            continue
+        failed = failures
+        selections = [*_field_paths(schema), ("no_such_field", False)]
+        for name, selectable in selections:
+            for arg in ("fields", "exclude"):
+                db.session.remove()
+                status = client.get(path, query_string={**base, arg: name}).status_code
+                if status >= 400 if selectable else status != 400:
+                    failures += 1
+                    click.echo(f"FAIL  {path}?{arg}={name}: HTTP {status}, expected {'2xx' if selectable else 400}")
+        if failures == failed:
+            click.echo(f"ok    {path}: {2 * len(selections)} selection(s)")
+    if failures:
+        raise SystemExit(1)
+
+
+# Filtered variants of list endpoints replayed by index-advisor; values name a sample-id table
+ADVISOR_FILTERS = {
+    "/api/classes/": [{"university_id": University}, {"tag_id": Tag}],
+    "/api/users/": [{"university_id": University}],
+    "/api/discussions/": [{"class_id": Class}, {"university_id": University}, {"user_id": User},
+                          {"class_group_id": ClassGroup}],
+    "/api/discussions/summary": [{"class_id": Class}, {"class_group_id": ClassGroup}],
+    "/api/replies/": [{"discussion_id": Discussion, "limit": 20}, {"user_id": User, "limit": 20}],
+}
+
+
+@app.cli.command("index-advisor")
+@click.option("--all", "show_all", is_flag=True, help="Print every plan, not only flagged ones")
+def index_advisor_command(show_all):
+    """Replay each GET endpoint's queries through EXPLAIN QUERY PLAN.
+
+    Flags full table scans and temp B-tree sorts (ORDER BY / GROUP BY /
+    DISTINCT that no index delivers). Some are expected, e.g. unfiltered
+    "list everything" endpoints; run it against a seeded database.
+    """
+    tables = set(db.metadata.tables)
+    client = app.test_client()
+    flagged = 0
+    for rule, path in _sample_get_requests():
+        if path is None:
+            click.echo(f"skip  {rule.rule} (no sample row)")
+            continue
+        variants = [{"q": "a"} if "search" in rule.rule else {}]
+        for filters in ADVISOR_FILTERS.get(rule.rule, []):
+            variants.append({
+                arg: (value.query.with_entities(value.id).limit(1).scalar() if isinstance(value, type) else value)
+                for arg, value in filters.items()
+            })
+        for query_string in variants:
+            db.session.remove()
+            with capture_selects() as statements:
+                client.get(path, query_string=query_string)
+            target = path + ("?" + "&".join(query_string) if query_string else "")
+            with db.engine.connect() as connection:
+                for statement, parameters in statements.values():
+                    plan = explain(connection, statement, parameters)
+                    findings = plan_findings(plan, tables)
+                    flagged += bool(findings)
+                    if findings or show_all:
+                        click.echo(f"{'FLAG' if findings else 'ok  '}  {target}: {'; '.join(findings) or 'indexed'}")
+                        click.echo("      " + " ".join(statement.split())[:200])
+                        click.echo("\n".join(f"        {line}" for line in plan))
+    click.echo(f"{flagged} flagged statement(s)")
+
 
 # Example test route
 @app.route("/")
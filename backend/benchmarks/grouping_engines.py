@@ -0,0 +1,107 @@
+# benchmarks/grouping_engines.py
+"""Recall/latency comparison of the exact and MinHash/LSH grouping engines.
+
+Runs entirely in memory on generated signatures, mirroring what
+assign_class_to_group does against the class_group_token and
+class_group_band indexes.
+
+    python benchmarks/grouping_engines.py --groups 20000 --queries 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.grouping import jaccard, minhash, lsh_band_keys
+
+
+def generate(n_groups: int, n_queries: int, vocab: int, seed: int):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab)]
+    groups = [frozenset(rng.sample(words, rng.randint(3, 6))) for _ in range(n_groups)]
+    queries = []
+    for _ in range(n_queries):
+        # perturb an existing group: drop one token, maybe add one
+        base = set(rng.choice(groups))
+        base.discard(rng.choice(sorted(base)))
+        if rng.random() < 0.5:
+            base.add(rng.choice(words))
+        queries.append(base)
+    return groups, queries
+
+
+def best_match(query, candidates, groups):
+    best, best_score = None, 0.0
+    for gid in candidates:
+        score = jaccard(query, groups[gid])
+        if score > best_score:
+            best, best_score = gid, score
+    return best, best_score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--params", default="20x3,16x4,32x2",
+                        help="comma separated BANDSxROWS settings to compare")
+    args = parser.parse_args()
+
+    groups, queries = generate(args.groups, args.queries, args.vocab, args.seed)
+    print(f"{args.groups} groups, {args.queries} queries, vocab {args.vocab}, threshold {args.threshold}\n")
+
+    # full scan: the pre-index behaviour and ground truth
+    start = time.perf_counter()
+    truth = [best_match(q, range(len(groups)), groups) for q in queries]
+    scan_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    expected = [(g, s) for g, s in truth if s >= args.threshold]
+
+    postings = defaultdict(set)
+    for gid, tokens in enumerate(groups):
+        for t in tokens:
+            postings[t].add(gid)
+
+    rows_out = [("full scan", 1.0, len(groups), scan_ms)]
+
+    start = time.perf_counter()
+    hits, scored = 0, 0
+    for q, (g, s) in zip(queries, truth):
+        candidates = set().union(*(postings[t] for t in q))
+        scored += len(candidates)
+        found = best_match(q, candidates, groups)
+        hits += s >= args.threshold and found[1] == s
+    rows_out.append(("exact (postings)", hits / max(len(expected), 1), scored / len(queries),
+                     (time.perf_counter() - start) * 1000 / len(queries)))
+
+    for spec in args.params.split(","):
+        bands, rows = (int(x) for x in spec.split("x"))
+        buckets = defaultdict(set)
+        for gid, tokens in enumerate(groups):
+            for key in lsh_band_keys(minhash(tokens, bands * rows), bands, rows):
+                buckets[key].add(gid)
+
+        start = time.perf_counter()
+        hits, scored = 0, 0
+        for q, (g, s) in zip(queries, truth):
+            keys = lsh_band_keys(minhash(q, bands * rows), bands, rows)
+            candidates = set().union(*(buckets.get(k, ()) for k in keys))
+            scored += len(candidates)
+            found = best_match(q, candidates, groups)
+            hits += s >= args.threshold and found[1] == s
+        rows_out.append((f"minhash {bands}x{rows}", hits / max(len(expected), 1), scored / len(queries),
+                         (time.perf_counter() - start) * 1000 / len(queries)))
+
+    print(f"{'engine':<18}{'recall':>8}{'scored/query':>14}{'ms/query':>10}")
+    for name, recall, scored, ms in rows_out:
+        print(f"{name:<18}{recall:>8.3f}{scored:>14.1f}{ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/sqlite_profiles.py
+"""Throughput of the "default" and "production" SQLite profiles under mixed concurrent load.
+
+Starts the API once per profile (threaded dev server, its own copy of the
+database) and runs worker threads that mix list GETs with reply POSTs,
+then reports requests/s, latency percentiles and failed requests.
+
+    python benchmarks/sqlite_profiles.py --threads 16 --seconds 15 --writes 0.2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READS = [
+    "/api/classes/",
+    "/api/discussions/summary?limit=20",
+    "/api/discussions/?limit=10",
+    "/api/tags/popular",
+    "/api/universities/",
+    "/api/users/",
+]
+
+SERVER = """
+import sys
+from werkzeug.serving import make_server
+from app import app
+make_server("127.0.0.1", int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(base, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return resp.status, resp.read()
+
+
+def start_server(profile: str, database: str, port: int):
+    env = {
+        **os.environ,
+        "SQLITE_PROFILE": profile,
+        "DATABASE_PATH": database,
+        # measure the database, not the response cache or ETags
+        "RESPONSE_CACHE": "0",
+        "ETAGS": "0",
+        "GROUPING_ASYNC": "0",
+        "QUERY_BUDGET": "off",
+    }
+    proc = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], cwd=BACKEND, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            request(base, "/api/universities/")
+            return proc, base
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"server for profile {profile} did not start")
+
+
+def run(profile: str, source_db: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench-{profile}-")
+    database = os.path.join(workdir, "universe.db")
+    shutil.copy(source_db, database)
+    proc, base = start_server(profile, database, free_port())
+    try:
+        users = [u["id"] for u in json.loads(request(base, "/api/users/")[1])]
+        discussions = [d["id"] for d in json.loads(request(base, "/api/discussions/summary")[1])]
+        latencies, failures = [], []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.seconds
+
+        def worker(seed):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if rng.random() < args.writes:
+                        request(base, "/api/replies/", {
+                            "body": "benchmark reply", "user_id": rng.choice(users), "discussion_id": rng.choice(discussions),
+                        })
+                    else:
+                        request(base, rng.choice(READS))
+                    ok = True
+                except (urllib.error.URLError, ConnectionError, TimeoutError) as exc:
+                    ok, error = False, getattr(exc, "code", type(exc).__name__)
+                with lock:
+                    if ok:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        failures.append(error)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies.sort()
+    pick = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else 0.0
+    return {
+        "profile": profile,
+        "ok": len(latencies),
+        "failed": len(failures),
+        "rps": len(latencies) / args.seconds,
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "errors": sorted({str(e) for e in failures}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=os.path.join(BACKEND, "database", "universe.db"),
+                        help="seeded database to copy for each run (python seed.py)")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--writes", type=float, default=0.2, help="share of requests that POST a reply")
+    parser.add_argument("--profiles", default="default,production")
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.seconds:g}s per profile, {args.writes:.0%} writes\n")
+    print(f"{'profile':<12}{'req/s':>8}{'ok':>8}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for profile in args.profiles.split(","):
+        r = run(profile, args.database, args)
+        print(f"{r['profile']:<12}{r['rps']:>8.1f}{r['ok']:>8}{r['failed']:>8}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}"
+              + (f"   errors: {', '.join(r['errors'])}" if r["errors"] else ""))
+
+
+if __name__ == "__main__":
+    main()
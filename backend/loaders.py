@@ -0,0 +1,101 @@
+# loaders.py
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload, undefer
+from models import Class, ClassGroup, ClassGroupMap, Discussion, Reply, University, User
+
+
+class LoaderProfile:
+    """Eager-loading plan for serializing a model with one response schema.
+
+    Maps schema field names to the loader options that field needs. Every
+    other relationship on the entity is raiseload(sql_only=True): a schema
+    change that starts reading an unloaded relationship fails loudly
+    instead of adding a query per row. Many-to-ones already in the
+    identity map still resolve without SQL.
+    """
+
+    def __init__(self, *always, **fields):
+        self.always = list(always)
+        self.fields = fields
+
+    def options(self, only=None, exclude=()) -> list:
+        """Loader options for the fields being serialized (all of them by default)."""
+        selected = [
+            option
+            for name, options in self.fields.items()
+            if (only is None or name in only) and name not in exclude
+            for option in options
+        ]
+        return [*self.always, *selected, raiseload("*", sql_only=True)]
+
+
+def _leaf(option):
+    # eager-load a relationship but nothing beyond it
+    return option.raiseload("*", sql_only=True)
+
+
+# ClassSchema
+CLASS = LoaderProfile(
+    university=[_leaf(joinedload(Class.university))],
+    class_group=[_leaf(joinedload(Class.class_group))],
+    tags=[_leaf(selectinload(Class.tags))],
+    group_id=[_leaf(joinedload(Class.group_map))],
+    group_label=[_leaf(joinedload(Class.group_map).joinedload(ClassGroupMap.class_group))],
+)
+
+# UserBaseSchema
+USER = LoaderProfile(
+    university=[_leaf(joinedload(User.university))],
+    classes=[_leaf(selectinload(User.classes))],
+    class_count=[_leaf(selectinload(User.classes))],
+)
+
+# UniversitySchema
+UNIVERSITY = LoaderProfile(
+    discussion_count=[undefer(University.discussion_count)],
+)
+
+# TagSchema (class_count is a column)
+TAG = LoaderProfile()
+
+# ClassGroupSchema
+CLASS_GROUP = LoaderProfile(
+    classes=[selectinload(ClassGroup.classes).options(*CLASS.options())],
+    class_count=[_leaf(selectinload(ClassGroup.classes))],
+)
+
+# ReplySchema
+REPLY = LoaderProfile(
+    author=[_leaf(joinedload(Reply.user))],
+    discussion_title=[_leaf(joinedload(Reply.discussion))],
+)
+
+# DiscussionSchema (replies resolve their discussion from the identity map)
+DISCUSSION = LoaderProfile(
+    author=[_leaf(joinedload(Discussion.user))],
+    class_name=[_leaf(joinedload(Discussion.class_))],
+    university=[_leaf(joinedload(Discussion.class_).joinedload(Class.university))],
+    replies=[selectinload(Discussion.replies).options(*REPLY.options(exclude=("discussion_title",)))],
+)
+
+# DiscussionSummarySchema: no body, no replies
+DISCUSSION_SUMMARY = LoaderProfile(
+    load_only(
+        Discussion.id, Discussion.title, Discussion.preview, Discussion.created_at, Discussion.last_activity_at,
+        Discussion.user_id, Discussion.class_id, Discussion.reply_count,
+        raiseload=True,
+    ),
+    author=DISCUSSION.fields["author"],
+    class_name=DISCUSSION.fields["class_name"],
+    university=DISCUSSION.fields["university"],
+)
+
+
+# Tables each schema's dump reads, for @conditional ETags (utils/table_versions.py)
+CLASS_TABLES = ("classes", "university", "class_group", "class_tag", "tag", "class_group_map")
+USER_TABLES = ("user", "university", "user_class", "classes")
+UNIVERSITY_TABLES = ("university", "classes")
+TAG_TABLES = ("tag",)
+CLASS_GROUP_TABLES = ("class_group", *CLASS_TABLES)
+REPLY_TABLES = ("reply", "user", "discussion")
+DISCUSSION_TABLES = ("discussion", "user", "classes", "university", "reply")
+DISCUSSION_SUMMARY_TABLES = ("discussion", "user", "classes", "university")
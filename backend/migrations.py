@@ -0,0 +1,87 @@
+# migrations.py
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from models import db
+from services.counter_service import install_counter_triggers, repair_counters
+from services.search_service import install_search_index, rebuild_search_index, search_index_missing
+
+
+def upgrade_schema():
+    """Bring an existing database up to the current models.
+
+    db.create_all() only creates missing tables; columns and indexes added
+    to a table that already exists, the full-text search index and the
+    counter triggers are created here, and VERSIONED_STEPS not yet applied
+    to this database are run.
+    """
+    created = set(db.metadata.tables) - set(inspect(db.engine).get_table_names())
+    db.create_all()
+    added = _add_missing_columns()
+    _create_missing_indexes()
+    _apply_versioned_steps()
+    _create_search_index()
+    with db.engine.begin() as connection:
+        install_counter_triggers(connection)
+        if added or created:
+            # new counter / summary columns and rollup tables start empty: backfill them
+            repair_counters(connection)
+
+
+def _add_missing_columns() -> list[str]:
+    """ALTER TABLE ADD COLUMN for model columns the database lacks (they need a server default)."""
+    added = []
+    with db.engine.begin() as connection:
+        # inspect through the same connection: the writer pool may hold only one
+        inspector = inspect(connection)
+        for table in db.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _create_missing_indexes():
+    # sqlite_master rather than the inspector: it also lists expression indexes
+    with db.engine.connect() as connection:
+        existing = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+
+
+def _drop_superseded_indexes(connection):
+    # single-column indexes that are prefixes of the (col, created_at, id) composites:
+    # the planner picked them and then sorted in a temp b-tree
+    for name in (
+        "ix_discussion_class_id", "ix_discussion_user_id",
+        "ix_reply_discussion_id", "ix_reply_user_id",
+        "ix_grouping_job_class_id",
+    ):
+        connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+
+
+# Changes the models can't describe (dropped indexes, data fixes), applied once each in
+# order; PRAGMA user_version holds the last version applied
+VERSIONED_STEPS = [
+    (1, _drop_superseded_indexes),
+]
+
+
+def _apply_versioned_steps():
+    with db.engine.begin() as connection:
+        current = connection.execute(text("PRAGMA user_version")).scalar()
+        for version, step in VERSIONED_STEPS:
+            if version > current:
+                step(connection)
+                connection.execute(text(f"PRAGMA user_version = {version}"))
+
+
+def _create_search_index():
+    with db.engine.begin() as connection:
+        if search_index_missing(connection):
+            install_search_index(connection)
+            rebuild_search_index(connection)
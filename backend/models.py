@@ -2,19 +2,24 @@ import uuid
 import datetime
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import Uuid
+from utils.sqlite_profile import ReadRoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": ReadRoutingSession})
 
 class_tag = db.Table(
     "class_tag",
     db.Column("class_id", Uuid, db.ForeignKey("classes.id", ondelete="CASCADE"), primary_key=True),
     db.Column("tag_id",   Uuid, db.ForeignKey("tag.id", ondelete="CASCADE"),   primary_key=True),
+    # reverse of the primary key: classes of a tag
+    db.Index("ix_class_tag_tag", "tag_id", "class_id"),
 )
 
 user_class = db.Table(
     "user_class",
     db.Column("user_id", Uuid, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
     db.Column("class_id", Uuid, db.ForeignKey("classes.id", ondelete="CASCADE"), primary_key=True),
+    # reverse of the primary key: users enrolled in a class
+    db.Index("ix_user_class_class", "class_id", "user_id"),
 )
 
 class User(db.Model):
@@ -49,6 +54,15 @@ class User(db.Model):
         lazy="selectin"
     )
 
+    __table_args__ = (
+        # typeahead prefix lookups (name LIKE 'q%' is case-insensitive)
+        db.Index("ix_user_name_nocase", db.collate(name, "NOCASE")),
+        # GET /universities/<id>/users keyset pages
+        db.Index("ix_user_university_created", "university_id", "created_at", "id"),
+        # GET /users (newest first)
+        db.Index("ix_user_created", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<User {self.email}>"
 
@@ -58,6 +72,15 @@ class University(db.Model):
     id = db.Column(Uuid, primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(100), unique=True, nullable=False)
 
+    # maintained by triggers (services/counter_service.py)
+    user_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    class_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # typeahead prefix lookups (name LIKE 'q%' is case-insensitive)
+        db.Index("ix_university_name_nocase", db.collate(name, "NOCASE")),
+    )
+
     def __repr__(self):
         return f"<University {self.name}>"
 
@@ -67,10 +90,15 @@ class Class(db.Model):
     id = db.Column(Uuid, primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(100), nullable=False)
 
+    # maintained by triggers (services/counter_service.py)
+    discussion_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     class_group_id = db.Column(
         Uuid,
         db.ForeignKey("class_group.id", ondelete="SET NULL"),
         nullable=True,
+        index=True,
     )
     class_group = db.relationship(
         "ClassGroup",
@@ -106,17 +134,32 @@ class Class(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("university_id", "name", name="uq_class_uni_name"),
+        # typeahead prefix lookups (name LIKE 'q%' is case-insensitive)
+        db.Index("ix_class_name_nocase", db.collate(name, "NOCASE")),
     )
 
     def __repr__(self):
         return f"<Class {self.name}>"
 
+# total discussions across a university's classes, summed from the class counters
+# (deferred: loaders.UNIVERSITY undefers it for the university endpoints)
+University.discussion_count = db.column_property(
+    db.select(db.func.coalesce(db.func.sum(Class.discussion_count), 0))
+    .where(Class.university_id == University.id)
+    .correlate_except(Class)
+    .scalar_subquery(),
+    deferred=True,
+)
+
 class Tag(db.Model):
     __tablename__ = "tag"
 
     id = db.Column(Uuid, primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(50), nullable=False, unique=True, index=True)
 
+    # maintained by triggers (services/counter_service.py)
+    class_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     classes = db.relationship(
         "Class",
         secondary=class_tag,
@@ -125,15 +168,39 @@ class Tag(db.Model):
         lazy="selectin"
     )
 
+    __table_args__ = (
+        # most-used tags overall (GET /tags/popular, /tags/stats)
+        db.Index("ix_tag_class_count", "class_count"),
+    )
+
     def __repr__(self):
         return f"<Tag {self.name}>"
 
+class TagUsage(db.Model):
+    """Classes using a tag within one university (rows only while the count is above 0)."""
+    __tablename__ = "tag_usage"
+
+    tag_id = db.Column(Uuid, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True)
+    university_id = db.Column(Uuid, db.ForeignKey("university.id", ondelete="CASCADE"), primary_key=True)
+    # maintained by triggers (services/counter_service.py)
+    class_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # most-used tags within a university
+        db.Index("ix_tag_usage_university_count", "university_id", "class_count"),
+    )
+
 class Discussion(db.Model):
     __tablename__ = "discussion"
 
     id = db.Column(Uuid, primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(100), nullable=False)
     body = db.Column(db.Text, nullable=False)
+
+    # maintained by triggers (services/counter_service.py)
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    preview = db.Column(db.String(200), nullable=True)
+    last_activity_at = db.Column(db.DateTime(timezone=True), nullable=True)
     created_at = db.Column(
         db.DateTime(timezone=True),
         server_default=db.func.now(),
@@ -145,7 +212,6 @@ class Discussion(db.Model):
         Uuid,
         db.ForeignKey("user.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     user = db.relationship(
         "User",
@@ -157,7 +223,6 @@ class Discussion(db.Model):
         Uuid,
         db.ForeignKey("classes.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     class_ = db.relationship(
         "Class",
@@ -174,6 +239,13 @@ class Discussion(db.Model):
         order_by=lambda: Reply.created_at.asc(),
     )
 
+    __table_args__ = (
+        # keyset pagination: (created_at, id) seeks, overall, within a class and by author
+        db.Index("ix_discussion_created", "created_at", "id"),
+        db.Index("ix_discussion_class_created", "class_id", "created_at", "id"),
+        db.Index("ix_discussion_user_created", "user_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Discussion {self.title}>"
 
@@ -193,7 +265,6 @@ class Reply(db.Model):
         Uuid,
         db.ForeignKey("user.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     user = db.relationship(
         "User",
@@ -205,13 +276,19 @@ class Reply(db.Model):
         Uuid,
         db.ForeignKey("discussion.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     discussion = db.relationship(
         "Discussion",
         back_populates="replies",
     )
 
+    __table_args__ = (
+        # keyset pagination: (created_at, id) seeks, overall, within a discussion and by author
+        db.Index("ix_reply_created", "created_at", "id"),
+        db.Index("ix_reply_discussion_created", "discussion_id", "created_at", "id"),
+        db.Index("ix_reply_user_created", "user_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Reply on Discussion {self.discussion_id}>"
 
@@ -237,4 +314,76 @@ class ClassGroupMap(db.Model):
 
     # relationships
     class_ = db.relationship("Class", backref=db.backref("group_map", uselist=False, cascade="all, delete-orphan"))
-    class_group = db.relationship("ClassGroup", backref=db.backref("members", lazy=True, cascade="all, delete"))
\ No newline at end of file
+    class_group = db.relationship("ClassGroup", backref=db.backref("members", lazy=True, cascade="all, delete"))
+
+class ClassGroupToken(db.Model):
+    """Posting list entry: one row per (signature token, group)."""
+    __tablename__ = "class_group_token"
+
+    token = db.Column(db.String(100), primary_key=True)
+    group_id = db.Column(Uuid, db.ForeignKey("class_group.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    class_group = db.relationship(
+        "ClassGroup",
+        backref=db.backref("tokens", lazy=True, cascade="all, delete-orphan", passive_deletes=True),
+    )
+
+
+class ClassGroupSketch(db.Model):
+    """MinHash sketch of a group's signature tokens, used by the LSH engine."""
+    __tablename__ = "class_group_sketch"
+
+    group_id = db.Column(Uuid, db.ForeignKey("class_group.id", ondelete="CASCADE"), primary_key=True)
+    bands = db.Column(db.Integer, nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    sketch = db.Column(db.LargeBinary, nullable=False)
+
+    class_group = db.relationship(
+        "ClassGroup",
+        backref=db.backref("sketch", uselist=False, cascade="all, delete-orphan", passive_deletes=True),
+    )
+
+class ClassGroupBand(db.Model):
+    """LSH bucket entry: one row per (band key, group)."""
+    __tablename__ = "class_group_band"
+
+    band_key = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    group_id = db.Column(Uuid, db.ForeignKey("class_group.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+    class_group = db.relationship(
+        "ClassGroup",
+        backref=db.backref("bands", lazy=True, cascade="all, delete-orphan", passive_deletes=True),
+    )
+
+
+class GroupingJob(db.Model):
+    """Durable queue entry asking the grouping worker to (re)group a class."""
+    __tablename__ = "grouping_job"
+
+    id = db.Column(Uuid, primary_key=True, default=uuid.uuid4)
+    class_id = db.Column(Uuid, db.ForeignKey("classes.id", ondelete="CASCADE"), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)  # pending/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(
+        db.DateTime(timezone=True),
+        server_default=db.func.now(),
+        default=lambda: datetime.datetime.now(datetime.timezone.utc),
+        nullable=False,
+    )
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=lambda: datetime.datetime.now(datetime.timezone.utc),
+        onupdate=lambda: datetime.datetime.now(datetime.timezone.utc),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        # at most one pending job per class: repeated writes coalesce onto it
+        db.Index("uq_grouping_job_pending", "class_id", unique=True, sqlite_where=db.text("status = 'pending'")),
+        # latest job of a class (GET /classes/<id>/grouping)
+        db.Index("ix_grouping_job_class_created", "class_id", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<GroupingJob {self.class_id} {self.status}>"
@@ -0,0 +1,23 @@
+from flask_smorest import Blueprint
+from schemas import CacheStatsSchema
+from utils.query_budget import query_budget
+from utils.response_cache import response_cache
+
+cache_bp = Blueprint("cache", __name__, url_prefix="/api/cache", description="Response cache")
+
+# ---------- GET /cache/stats ----------
+@cache_bp.route("/stats", methods=["GET"])
+@cache_bp.response(200, CacheStatsSchema)
+@query_budget(0)
+def get_cache_stats():
+    """Hit/miss counters and memory use of the in-process response cache"""
+    return response_cache.snapshot()
+
+
+# ---------- DELETE /cache ----------
+@cache_bp.route("/", methods=["DELETE"])
+@cache_bp.response(204)
+def clear_cache():
+    """Admin: drop every cached response (e.g. after writing with a flask CLI command)"""
+    response_cache.clear()
+    return {}
@@ -1,21 +1,36 @@
 from flask_smorest import Blueprint
 from models import db, Class, ClassGroup, ClassGroupMap
 from schemas import ClassGroupSchema, ClassGroupCreateSchema, ClassGroupUpdateSchema
+from schemas import ClassGroupRegroupSchema, ClassGroupRegroupResultSchema
+import loaders
+from services.grouping_service import index_group
+from services.regroup_service import regroup_all
 import uuid
+from utils.query_budget import query_budget
+from utils.table_versions import conditional
+from utils.response_cache import cached
+from utils.fieldsets import sparse_fieldset, requested_fields
 
 class_group_bp = Blueprint("class_groups", __name__, url_prefix="/api/class-groups", description="Class group operations")
 
 @class_group_bp.route("/", methods=["GET"])
+@cached(*loaders.CLASS_GROUP_TABLES)
 @class_group_bp.response(200, ClassGroupSchema(many=True))
+@conditional(*loaders.CLASS_GROUP_TABLES)
+@sparse_fieldset(ClassGroupSchema(many=True))
+@query_budget(3)
 def get_class_groups():
     """Get all class groups"""
-    return ClassGroup.query.all()
+    return ClassGroup.query.options(*loaders.CLASS_GROUP.options(**requested_fields())).all()
 
 @class_group_bp.route("/<uuid:group_id>", methods=["GET"])
 @class_group_bp.response(200, ClassGroupSchema)
+@conditional(*loaders.CLASS_GROUP_TABLES)
+@sparse_fieldset(ClassGroupSchema())
+@query_budget(3)
 def get_class_group(group_id):
     """Get a class group with all its classes"""
-    return ClassGroup.query.get_or_404(group_id)
+    return ClassGroup.query.options(*loaders.CLASS_GROUP.options(**requested_fields())).get_or_404(group_id)
 
 @class_group_bp.route("/", methods=["POST"])
 @class_group_bp.arguments(ClassGroupCreateSchema)
@@ -28,6 +43,7 @@ def create_class_group(data):
         description=data.get("description"),
         signature=data["name"].lower().replace(" ", "-"),  # Generate signature from name
     )
+    index_group(group)
     db.session.add(group)
     db.session.commit()
     return group
@@ -54,13 +70,22 @@ def delete_class_group(group_id):
     db.session.commit()
     return {}
 
+@class_group_bp.route("/regroup", methods=["POST"])
+@class_group_bp.arguments(ClassGroupRegroupSchema)
+@class_group_bp.response(200, ClassGroupRegroupResultSchema)
+def regroup(data):
+    """Admin: recluster every class into groups in one bulk pass"""
+    return regroup_all(data["threshold"])
+
 @class_group_bp.route("/by-class/<uuid:class_id>", methods=["GET"])
+@conditional(*loaders.CLASS_TABLES)
+@query_budget(4)
 def by_class(class_id):
     """Get all classes in the same group as the given class"""
     mapping = ClassGroupMap.query.filter_by(class_id=class_id).first_or_404()
     siblings = ClassGroupMap.query.filter_by(group_id=mapping.group_id).all()
     ids = [m.class_id for m in siblings]
-    classes = Class.query.filter(Class.id.in_(ids)).all()
+    classes = Class.query.options(*loaders.CLASS.options(only=("university", "tags"))).filter(Class.id.in_(ids)).all()
     out = []
     for c in classes:
         out.append({
@@ -1,43 +1,62 @@
 from flask import request, abort
 from flask_smorest import Blueprint
-from models import db, Class, University, Tag
-from schemas import ClassSchema, ClassCreateSchema, ClassUpdateSchema
+from models import db, Class, University, Tag, GroupingJob
+from schemas import (
+    ClassSchema, ClassCreateSchema, ClassUpdateSchema, GroupingJobSchema,
+    ClassImportQuerySchema, ClassImportResultSchema,
+)
+import loaders
+from services.search_service import name_filter
 from sqlalchemy import func
 import uuid
 
-# NEW: import service
-from services.grouping_service import assign_class_to_group
+from services.grouping_queue import enqueue_grouping, dispatch_grouping
+from services.import_service import import_classes
+from utils.query_budget import query_budget
+from utils.request_args import uuid_arg
+from utils.table_versions import conditional
+from utils.fieldsets import sparse_fieldset, requested_fields
+from utils.streaming import streamable
 
 class_bp = Blueprint("classes", __name__, url_prefix="/api/classes", description="Class operations")
 
 # ---------- GET /classes ----------
 @class_bp.route("/", methods=["GET"])
 @class_bp.response(200, ClassSchema(many=True))
+@conditional(*loaders.CLASS_TABLES)
+@sparse_fieldset(ClassSchema(many=True))
+@streamable()
+@query_budget(2)
 def get_classes():
-    """Get all classes (optionally filtered by university or tag)"""
-    university_id = request.args.get("university_id")
-    tag_id = request.args.get("tag_id")
+    """Get all classes (optionally filtered by university or tag)
+
+    ``stream=true`` sends the same array as a chunked stream.
+    """
+    university_id = uuid_arg("university_id")
+    tag_id = uuid_arg("tag_id")
     search = request.args.get("q")
 
-    q = Class.query.join(Class.university)
+    q = Class.query.join(Class.university).options(*loaders.CLASS.options(**requested_fields()))
 
     if university_id:
         q = q.filter(Class.university_id == university_id)
     if tag_id:
         q = q.join(Class.tags).filter(Tag.id == tag_id)
     if search:
-        q = q.filter(Class.name.ilike(f"%{search}%"))
+        q = q.filter(name_filter(Class, search))
 
-    classes = q.order_by(Class.name.asc()).all()
-    return classes
+    return q.order_by(Class.name.asc())
 
 
 # ---------- GET /classes/<id> ----------
 @class_bp.route("/<uuid:class_id>", methods=["GET"])
 @class_bp.response(200, ClassSchema)
+@conditional(*loaders.CLASS_TABLES)
+@sparse_fieldset(ClassSchema())
+@query_budget(2)
 def get_class(class_id):
     """Get details of a single class"""
-    c = Class.query.get_or_404(class_id)
+    c = Class.query.options(*loaders.CLASS.options(**requested_fields())).get_or_404(class_id)
     return c
 
 
@@ -75,15 +94,44 @@ def create_class(data):
         new_class.tags = tags
 
     db.session.add(new_class)
-    db.session.commit()   # ensure new_class.id exists for mapping
 
-    # --- HERO: auto group across universities ---
-    assign_class_to_group(new_class)
+    # --- HERO: auto group across universities (queued, runs after the response) ---
+    enqueue_grouping(new_class.id)
+    db.session.commit()
+    dispatch_grouping()
 
     # Re-load if you want fresh relationships for serialization (optional)
     return Class.query.get(new_class.id)
 
 
+# ---------- POST /classes/import ----------
+IMPORT_MIMETYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+@class_bp.route("/import", methods=["POST"])
+@class_bp.arguments(ClassImportQuerySchema, location="query")
+@class_bp.response(200, ClassImportResultSchema)
+def import_classes_route(query_args):
+    """Bulk-create classes from a CSV or NDJSON body (streamed, per-row error report)
+
+    Rows: name, university_id or university (name), tags (names or ids;
+    ';'-separated in CSV). The body is read as a stream and inserted in
+    chunks, so its size is not limited by memory.
+    """
+    fmt = query_args.get("format") or IMPORT_MIMETYPES.get(request.mimetype)
+    if fmt is None:
+        abort(415, description="Send text/csv or application/x-ndjson, or pass ?format=")
+    result = import_classes(request.stream, fmt, group=query_args["group"])
+    if result["queued"]:
+        dispatch_grouping()
+    return result
+
+
 # ---------- PUT /classes/<id> ----------
 @class_bp.route("/<uuid:class_id>", methods=["PUT"])
 @class_bp.arguments(ClassUpdateSchema)
@@ -104,14 +152,31 @@ def update_class(data, class_id):
     if "tag_ids" in data:
         c.tags = Tag.query.filter(Tag.id.in_(data["tag_ids"])).all()
 
+    # --- HERO: re-evaluate grouping if name/tags changed (queued) ---
+    enqueue_grouping(c.id)
     db.session.commit()
-
-    # --- HERO: re-evaluate grouping if name/tags changed ---
-    assign_class_to_group(c)
+    dispatch_grouping()
 
     return Class.query.get(c.id)
 
 
+# ---------- GET /classes/<id>/grouping ----------
+@class_bp.route("/<uuid:class_id>/grouping", methods=["GET"])
+@class_bp.response(200, GroupingJobSchema)
+@conditional("classes", "grouping_job")
+@sparse_fieldset(GroupingJobSchema())
+@query_budget(2)
+def get_class_grouping(class_id):
+    """Get the status of the latest grouping job for a class"""
+    Class.query.get_or_404(class_id)
+    job = (GroupingJob.query.filter_by(class_id=class_id)
+           .order_by(GroupingJob.created_at.desc())
+           .first())
+    if not job:
+        abort(404, description="No grouping job for this class")
+    return job
+
+
 # ---------- DELETE /classes/<id> ----------
 @class_bp.route("/<uuid:class_id>", methods=["DELETE"])
 @class_bp.response(204)
@@ -1,8 +1,16 @@
+from flask import Response, stream_with_context
 from flask_smorest import Blueprint
 from models import db, Discussion, Class
 from schemas import DiscussionSchema, DiscussionCreateSchema, DiscussionUpdateSchema, DiscussionQuerySchema
-from sqlalchemy import or_
+from schemas import DiscussionSummarySchema, DiscussionExportQuerySchema
+import loaders
+from services.search_service import discussion_text_filter
+from services.export_service import export_discussions
+from utils.pagination import keyset_page, pagination_header
 import uuid
+from utils.query_budget import query_budget
+from utils.table_versions import conditional
+from utils.fieldsets import sparse_fieldset, requested_fields
 
 discussion_bp = Blueprint("discussion", __name__, url_prefix="/api/discussions")
 
@@ -10,15 +18,55 @@ discussion_bp = Blueprint("discussion", __name__, url_prefix="/api/discussions")
 @discussion_bp.route("/", methods=["GET"])
 @discussion_bp.arguments(DiscussionQuerySchema, location="query")
 @discussion_bp.response(200, DiscussionSchema(many=True))
+@conditional(*loaders.DISCUSSION_TABLES)
+@sparse_fieldset(DiscussionSchema(many=True))
+@query_budget(2)
 def get_discussions(query_args):
-    """Get all discussions (optionally filtered by class, university, user, or class group)"""
+    """Get all discussions (optionally filtered by class, university, user, or class group)
+
+    Newest first. Pass ``limit`` (and the previous page's ``next_cursor`` as
+    ``cursor``) to page through results; page info is in the X-Pagination header.
+    """
+    return _list_discussions(query_args, loaders.DISCUSSION)
+
+
+# ---------- GET /discussions/summary ----------
+@discussion_bp.route("/summary", methods=["GET"])
+@discussion_bp.arguments(DiscussionQuerySchema, location="query")
+@discussion_bp.response(200, DiscussionSummarySchema(many=True))
+@conditional(*loaders.DISCUSSION_SUMMARY_TABLES)
+@sparse_fieldset(DiscussionSummarySchema(many=True))
+@query_budget(1)
+def get_discussion_summaries(query_args):
+    """Feed view of GET /discussions: stored preview instead of the body, no replies
+
+    Same filters and pagination as GET /discussions.
+    """
+    return _list_discussions(query_args, loaders.DISCUSSION_SUMMARY)
+
+
+# ---------- GET /discussions/export ----------
+@discussion_bp.route("/export", methods=["GET"])
+@discussion_bp.arguments(DiscussionExportQuerySchema, location="query")
+@conditional(*loaders.DISCUSSION_TABLES)
+@query_budget(None, repeats=None)
+def export_discussions_route(query_args):
+    """Stream every discussion with its replies as NDJSON, oldest first (for analytics)
+
+    Filters: ``since`` (created at or after) and ``class_group_id``.
+    """
+    lines = export_discussions(query_args.get("since"), query_args.get("class_group_id"))
+    return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+
+def _list_discussions(query_args, profile):
     class_id = query_args.get("class_id")
     university_id = query_args.get("university_id")
     user_id = query_args.get("user_id")
     class_group_id = query_args.get("class_group_id")
     search = query_args.get("q")
 
-    q = Discussion.query.join(Discussion.user).join(Discussion.class_)
+    q = Discussion.query.join(Discussion.user).join(Discussion.class_).options(*profile.options(**requested_fields()))
     if class_id:
         q = q.filter(Discussion.class_id == class_id)
     if university_id:
@@ -29,14 +77,17 @@ def get_discussions(query_args):
         # Get all classes in this group and filter discussions by those class IDs
         q = q.filter(Class.class_group_id == class_group_id)
     if search:
-        q = q.filter(
-            or_(
-                Discussion.title.ilike(f"%{search}%"),
-                Discussion.body.ilike(f"%{search}%")
-            )
-        )
+        # full-text index on title/body (every word must match as a prefix)
+        q = q.filter(discussion_text_filter(search))
 
-    return q.order_by(Discussion.created_at.desc()).all()
+    limit = query_args.get("limit")
+    cursor = query_args.get("cursor")
+    discussions, next_cursor = keyset_page(
+        q, Discussion.created_at, Discussion.id, limit, cursor, descending=True
+    )
+    if limit is None and cursor is None:
+        return discussions
+    return discussions, pagination_header(limit, next_cursor)
 
 
 # ---------- POST /discussions ----------
@@ -60,14 +111,18 @@ def create_discussion(data):
 # ---------- GET /discussions/<id> ----------
 @discussion_bp.route("/<uuid:discussion_id>", methods=["GET"])
 @discussion_bp.response(200, DiscussionSchema)
+@conditional(*loaders.DISCUSSION_TABLES)
+@sparse_fieldset(DiscussionSchema())
+@query_budget(2)
 def get_discussion(discussion_id):
     """Get a discussion by ID"""
-    return Discussion.query.get_or_404(discussion_id)
+    return Discussion.query.options(*loaders.DISCUSSION.options(**requested_fields())).get_or_404(discussion_id)
 
 
 # ---------- GET /discussions/<id>/replies ----------
 @discussion_bp.route("/<uuid:discussion_id>/replies", methods=["GET"])
 @discussion_bp.response(200)
+@query_budget(0)
 def get_discussion_replies(discussion_id):
     """Get replies for a discussion (redirect to /api/replies?discussion_id=<id>)"""
     return {"message": "Use GET /api/replies?discussion_id={} to get replies".format(discussion_id)}
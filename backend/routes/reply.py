@@ -1,7 +1,13 @@
 from flask_smorest import Blueprint
 from models import db, Reply, User, Discussion
 from schemas import ReplySchema, ReplyCreateSchema, ReplyUpdateSchema, ReplyQuerySchema
+import loaders
+from utils.pagination import keyset_page, pagination_header
 import uuid
+from utils.query_budget import query_budget
+from utils.table_versions import conditional
+from utils.fieldsets import sparse_fieldset, requested_fields
+from utils.streaming import streamable
 
 reply_bp = Blueprint("reply", __name__, url_prefix="/api/replies")
 
@@ -9,18 +15,33 @@ reply_bp = Blueprint("reply", __name__, url_prefix="/api/replies")
 @reply_bp.route("/", methods=["GET"])
 @reply_bp.arguments(ReplyQuerySchema, location="query")
 @reply_bp.response(200, ReplySchema(many=True))
+@conditional(*loaders.REPLY_TABLES)
+@sparse_fieldset(ReplySchema(many=True))
+@streamable()
+@query_budget(1)
 def get_replies(query_args):
-    """List all replies (optionally filtered by discussion_id or user_id)"""
+    """List all replies (optionally filtered by discussion_id or user_id)
+
+    Oldest first. Pass ``limit`` (and the previous page's ``next_cursor`` as
+    ``cursor``) to page through results; page info is in the X-Pagination header.
+    Unpaged, ``stream=true`` sends the same array as a chunked stream.
+    """
     discussion_id = query_args.get("discussion_id")
     user_id = query_args.get("user_id")
 
-    q = Reply.query.join(Reply.user).join(Reply.discussion)
+    q = Reply.query.join(Reply.user).join(Reply.discussion).options(*loaders.REPLY.options(**requested_fields()))
     if discussion_id:
         q = q.filter(Reply.discussion_id == discussion_id)
     if user_id:
         q = q.filter(Reply.user_id == user_id)
 
-    return q.order_by(Reply.created_at.asc()).all()
+    limit = query_args.get("limit")
+    cursor = query_args.get("cursor")
+    if limit is None and cursor is None:
+        # unpaged: @streamable runs it, all at once or in chunks (?stream=true)
+        return q.order_by(Reply.created_at.asc(), Reply.id.asc())
+    replies, next_cursor = keyset_page(q, Reply.created_at, Reply.id, limit, cursor)
+    return replies, pagination_header(limit, next_cursor)
 
 
 # ---------- POST /replies ----------
@@ -0,0 +1,33 @@
+from flask_smorest import Blueprint
+from schemas import SearchQuerySchema, DiscussionSearchResultSchema, TypeaheadQuerySchema, TypeaheadResultSchema
+from services.search_service import search_discussions, typeahead, TYPEAHEAD_SOURCES
+import loaders
+from utils.query_budget import query_budget
+from utils.table_versions import conditional
+from utils.fieldsets import sparse_fieldset
+
+search_bp = Blueprint("search", __name__, url_prefix="/api/search", description="Full-text search")
+
+# ---------- GET /search/discussions ----------
+@search_bp.route("/discussions", methods=["GET"])
+@search_bp.arguments(SearchQuerySchema, location="query")
+@search_bp.response(200, DiscussionSearchResultSchema(many=True))
+@conditional(*loaders.DISCUSSION_TABLES)
+@sparse_fieldset(DiscussionSearchResultSchema(many=True))
+@query_budget(4)
+def search_discussion_text(query_args):
+    """Search discussion titles, bodies and replies, best match first (BM25) with highlighted snippets"""
+    return search_discussions(query_args["q"], query_args["limit"], query_args["offset"])
+
+
+# ---------- GET /search/typeahead ----------
+@search_bp.route("/typeahead", methods=["GET"])
+@search_bp.arguments(TypeaheadQuerySchema, location="query")
+@search_bp.response(200, TypeaheadResultSchema(many=True))
+@conditional("classes", "university", "user")
+@sparse_fieldset(TypeaheadResultSchema(many=True))
+@query_budget(6)
+def search_typeahead(query_args):
+    """Classes, universities and users whose name contains q (prefix matches first); cheap enough per keystroke"""
+    kinds = [query_args["type"]] if "type" in query_args else list(TYPEAHEAD_SOURCES)
+    return typeahead(query_args["q"], kinds, query_args["limit"])
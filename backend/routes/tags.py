@@ -1,22 +1,32 @@
 from flask import request, jsonify, abort
 from flask_smorest import Blueprint
-from models import db, Tag, Class
-from schemas import TagSchema, TagCreateSchema, TagUpdateSchema
-from sqlalchemy import func
-import uuid
+from models import db, Tag, TagUsage, class_tag
+from schemas import TagSchema, TagCreateSchema, TagUpdateSchema, TagMergeSchema
+import loaders
+from services.grouping_queue import enqueue_grouping_many, classes_with_tag, dispatch_grouping
+from sqlalchemy import func, insert, literal, select, true
+from sqlalchemy.orm import selectinload
+from utils.query_budget import query_budget
+from utils.request_args import uuid_arg
+from utils.table_versions import conditional
+from utils.response_cache import cached
+from utils.fieldsets import sparse_fieldset, requested_fields
 
 tags_bp = Blueprint("tags", __name__, url_prefix="/api/tags", description="Tag operations")
 
 # ---------- GET /tags ----------
 @tags_bp.route("/", methods=["GET"])
 @tags_bp.response(200, TagSchema(many=True))
+@conditional(*loaders.TAG_TABLES)
+@sparse_fieldset(TagSchema(many=True))
+@query_budget(1)
 def get_tags():
     """Get all tags with optional filtering and statistics"""
     search = request.args.get("q")
     sort_by = request.args.get("sort_by", "name")  
     limit = request.args.get("limit", type=int)
     
-    q = Tag.query
+    q = Tag.query.options(*loaders.TAG.options(**requested_fields()))
     
     # Search filter
     if search:
@@ -25,7 +35,7 @@ def get_tags():
     # Sorting
     if sort_by == "usage":
         # Sort by number of classes using this tag
-        q = q.outerjoin(Tag.classes).group_by(Tag.id).order_by(func.count(Class.id).desc())
+        q = q.order_by(Tag.class_count.desc())
     elif sort_by == "name":
         q = q.order_by(Tag.name.asc())
     
@@ -40,9 +50,12 @@ def get_tags():
 # ---------- GET /tags/<tag_id> ----------
 @tags_bp.route("/<uuid:tag_id>", methods=["GET"])
 @tags_bp.response(200, TagSchema)
+@conditional(*loaders.TAG_TABLES)
+@sparse_fieldset(TagSchema())
+@query_budget(1)
 def get_tag(tag_id):
     """Get a specific tag with all its associated classes"""
-    tag = Tag.query.get_or_404(tag_id)
+    tag = Tag.query.options(*loaders.TAG.options(**requested_fields())).get_or_404(tag_id)
     return tag
 
 
@@ -83,8 +96,16 @@ def update_tag(data, tag_id):
     if existing_tag:
         abort(409, description="A tag with this name already exists")
     
-    tag.name = data["name"].strip()
+    new_name = data["name"].strip()
+    renamed = new_name != tag.name
+    tag.name = new_name
+
+    # Tag names feed class signatures: regroup just the classes carrying it
+    if renamed:
+        enqueue_grouping_many(classes_with_tag(tag_id))
     db.session.commit()
+    if renamed:
+        dispatch_grouping()
     return tag
 
 
@@ -94,16 +115,52 @@ def update_tag(data, tag_id):
 def delete_tag(tag_id):
     """Delete a tag (this will also remove it from all associated classes)"""
     tag = Tag.query.get_or_404(tag_id)
+    affected = classes_with_tag(tag_id)
     db.session.delete(tag)
+    enqueue_grouping_many(affected)
     db.session.commit()
+    dispatch_grouping()
     return {}
 
 
+# ---------- POST /tags/<tag_id>/merge ----------
+@tags_bp.route("/<uuid:tag_id>/merge", methods=["POST"])
+@tags_bp.arguments(TagMergeSchema)
+@tags_bp.response(200, TagSchema)
+def merge_tag(data, tag_id):
+    """Merge a tag into another: its classes get the target tag and the tag is deleted"""
+    tag = Tag.query.get_or_404(tag_id)
+    target = Tag.query.get_or_404(data["target_id"])
+    if target.id == tag.id:
+        abort(400, description="Cannot merge a tag into itself")
+
+    affected = classes_with_tag(tag_id)
+    db.session.execute(
+        insert(class_tag).from_select(
+            ["class_id", "tag_id"],
+            select(class_tag.c.class_id, db.literal(target.id, type_=class_tag.c.tag_id.type))
+            .where(class_tag.c.tag_id == tag_id)
+            .where(class_tag.c.class_id.not_in(
+                select(class_tag.c.class_id).where(class_tag.c.tag_id == target.id)
+            )),
+        )
+    )
+    db.session.delete(tag)
+    enqueue_grouping_many(affected)
+    db.session.commit()
+    dispatch_grouping()
+    return target
+
+
 # ---------- GET /tags/<tag_id>/classes ----------
 @tags_bp.route("/<uuid:tag_id>/classes", methods=["GET"])
+@conditional("tag", *loaders.CLASS_TABLES)
+@query_budget(3)
 def get_tag_classes(tag_id):
     """Get all classes associated with a specific tag"""
-    tag = Tag.query.get_or_404(tag_id)
+    tag = Tag.query.options(
+        selectinload(Tag.classes).options(*loaders.CLASS.options(only=("university", "tags")))
+    ).get_or_404(tag_id)
     
     university_id = request.args.get("university_id")
     classes = tag.classes
@@ -133,54 +190,63 @@ def get_tag_classes(tag_id):
 
 # ---------- GET /tags/popular ----------
 @tags_bp.route("/popular", methods=["GET"])
+@cached("tag", "tag_usage")
+@conditional("tag", "tag_usage")
+@query_budget(1)
 def get_popular_tags():
     """Get most popular tags by usage count"""
     limit = request.args.get("limit", default=10, type=int)
-    university_id = request.args.get("university_id")
-    
-    q = Tag.query.join(Tag.classes)
-    
-    if university_id:
-        q = q.filter(Class.university_id == university_id)
-    
-    # Group by tag and count classes
-    tags = (q.group_by(Tag.id)
-            .order_by(func.count(Class.id).desc())
-            .limit(limit)
-            .all())
-    
+    university_id = uuid_arg("university_id")
+
+    tags = _tags_in_use(university_id).limit(limit).all()
     return jsonify([
-        {
-            "id": str(tag.id),
-            "name": tag.name,
-            "class_count": len([c for c in tag.classes if not university_id or str(c.university_id) == university_id])
-        }
-        for tag in tags
+        {"id": str(tag_id), "name": name, "class_count": class_count}
+        for tag_id, name, class_count in tags
     ])
 
 
 # ---------- GET /tags/stats ----------
 @tags_bp.route("/stats", methods=["GET"])
+@cached("tag", "tag_usage")
+@conditional("tag", "tag_usage")
+@query_budget(1)
 def get_tag_stats():
-    """Get overall tag statistics"""
-    total_tags = Tag.query.count()
-    
-    # Tags with no classes
-    unused_tags = Tag.query.outerjoin(Tag.classes).group_by(Tag.id).having(func.count(Class.id) == 0).count()
-    
-    # Most used tag
-    most_used = (Tag.query.join(Tag.classes)
-                 .group_by(Tag.id)
-                 .order_by(func.count(Class.id).desc())
-                 .first())
-    
+    """Get overall tag statistics (or within one university with ?university_id=)"""
+    university_id = uuid_arg("university_id")
+
+    in_use = _tags_in_use(university_id)
+    top = in_use.limit(1).subquery()
+    total_tags, tags_in_use, top_id, top_name, top_count = db.session.execute(
+        select(
+            select(func.count()).select_from(Tag).scalar_subquery(),
+            select(func.count()).select_from(in_use.order_by(None).subquery()).scalar_subquery(),
+            top.c.id, top.c.name, top.c.class_count,
+        ).select_from(select(literal(1)).subquery().outerjoin(top, true()))
+    ).one()
+
     return jsonify({
         "total_tags": total_tags,
-        "unused_tags": unused_tags,
-        "tags_in_use": total_tags - unused_tags,
+        "unused_tags": total_tags - tags_in_use,
+        "tags_in_use": tags_in_use,
         "most_popular_tag": {
-            "id": str(most_used.id),
-            "name": most_used.name,
-            "class_count": len(most_used.classes)
-        } if most_used else None
-    })
\ No newline at end of file
+            "id": str(top_id),
+            "name": top_name,
+            "class_count": top_count
+        } if top_id else None
+    })
+
+
+def _tags_in_use(university_id=None):
+    """(id, name, class_count) of tags on at least one class, most used first.
+
+    Overall counts come from tag.class_count, per-university ones from the
+    tag_usage rollup; both are trigger-maintained and indexed on the count.
+    """
+    if university_id:
+        return (
+            db.session.query(Tag.id, Tag.name, TagUsage.class_count)
+            .join(TagUsage, TagUsage.tag_id == Tag.id)
+            .filter(TagUsage.university_id == university_id)
+            .order_by(TagUsage.class_count.desc())
+        )
+    return db.session.query(Tag.id, Tag.name, Tag.class_count).filter(Tag.class_count > 0).order_by(Tag.class_count.desc())
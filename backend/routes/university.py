@@ -1,29 +1,97 @@
 from flask_smorest import Blueprint
 from flask import request
-from models import db, University
+from models import db, University, User, Class, Discussion
 from schemas import UniversitySchema, UniversityCreateSchema, UniversityUpdateSchema, ClassSchema
+from schemas import UserBaseSchema, DiscussionSummarySchema, PageQuerySchema
+import loaders
+from services.search_service import name_filter
+from utils.pagination import keyset_page, pagination_header
 import uuid
+from utils.query_budget import query_budget
+from utils.table_versions import conditional
+from utils.response_cache import cached
+from utils.fieldsets import sparse_fieldset, requested_fields
 
 university_bp = Blueprint("university", __name__, url_prefix="/api/universities")
 
 # ---------- GET /universities ----------
 @university_bp.route("/", methods=["GET"])
+@cached(*loaders.UNIVERSITY_TABLES)
 @university_bp.response(200, UniversitySchema(many=True))
+@conditional(*loaders.UNIVERSITY_TABLES)
+@sparse_fieldset(UniversitySchema(many=True))
+@query_budget(1)
 def get_universities():
-    """List all universities"""
+    """List all universities with their user, class and discussion counts"""
     search = request.args.get("q")
-    q = University.query
+    q = University.query.options(*loaders.UNIVERSITY.options(**requested_fields()))
     if search:
-        q = q.filter(University.name.ilike(f"%{search}%"))
+        q = q.filter(name_filter(University, search))
     return q.order_by(University.name.asc()).all()
 
 
 # ---------- GET /universities/<id> ----------
 @university_bp.route("/<uuid:university_id>", methods=["GET"])
 @university_bp.response(200, UniversitySchema)
+@conditional(*loaders.UNIVERSITY_TABLES)
+@sparse_fieldset(UniversitySchema())
+@query_budget(1)
 def get_university(university_id):
-    """Get a university by ID"""
-    return University.query.get_or_404(university_id)
+    """Get a university by ID (counts only; see the sub-resources below)"""
+    return University.query.options(*loaders.UNIVERSITY.options(**requested_fields())).get_or_404(university_id)
+
+
+# ---------- GET /universities/<id>/users ----------
+@university_bp.route("/<uuid:university_id>/users", methods=["GET"])
+@university_bp.arguments(PageQuerySchema, location="query")
+@university_bp.response(200, UserBaseSchema(many=True))
+@conditional(*loaders.USER_TABLES)
+@sparse_fieldset(UserBaseSchema(many=True))
+@query_budget(3)
+def get_university_users(query_args, university_id):
+    """Members of a university, newest first, one keyset page at a time (X-Pagination header)"""
+    University.query.get_or_404(university_id)
+    q = User.query.filter(User.university_id == university_id).options(*loaders.USER.options(**requested_fields()))
+    users, next_cursor = keyset_page(
+        q, User.created_at, User.id, query_args["limit"], query_args.get("cursor"), descending=True
+    )
+    return users, pagination_header(query_args["limit"], next_cursor)
+
+
+# ---------- GET /universities/<id>/classes ----------
+@university_bp.route("/<uuid:university_id>/classes", methods=["GET"])
+@university_bp.arguments(PageQuerySchema, location="query")
+@university_bp.response(200, ClassSchema(many=True))
+@conditional(*loaders.CLASS_TABLES)
+@sparse_fieldset(ClassSchema(many=True))
+@query_budget(3)
+def get_university_classes(query_args, university_id):
+    """Classes of a university by name, one keyset page at a time (X-Pagination header)"""
+    University.query.get_or_404(university_id)
+    q = Class.query.filter(Class.university_id == university_id).options(*loaders.CLASS.options(**requested_fields()))
+    classes, next_cursor = keyset_page(q, Class.name, Class.id, query_args["limit"], query_args.get("cursor"))
+    return classes, pagination_header(query_args["limit"], next_cursor)
+
+
+# ---------- GET /universities/<id>/discussions ----------
+@university_bp.route("/<uuid:university_id>/discussions", methods=["GET"])
+@university_bp.arguments(PageQuerySchema, location="query")
+@university_bp.response(200, DiscussionSummarySchema(many=True))
+@conditional(*loaders.DISCUSSION_SUMMARY_TABLES)
+@sparse_fieldset(DiscussionSummarySchema(many=True))
+@query_budget(2)
+def get_university_discussions(query_args, university_id):
+    """Discussion summaries across a university's classes, newest first (X-Pagination header)"""
+    University.query.get_or_404(university_id)
+    q = (
+        Discussion.query.join(Discussion.class_)
+        .filter(Class.university_id == university_id)
+        .options(*loaders.DISCUSSION_SUMMARY.options(**requested_fields()))
+    )
+    discussions, next_cursor = keyset_page(
+        q, Discussion.created_at, Discussion.id, query_args["limit"], query_args.get("cursor"), descending=True
+    )
+    return discussions, pagination_header(query_args["limit"], next_cursor)
 
 
 # ---------- POST /universities ----------
@@ -2,34 +2,51 @@ from flask_smorest import Blueprint
 from flask import request
 from models import db, User, University, Class, Discussion, Reply
 from schemas import UserBaseSchema, UserCreateSchema, UserLoginSchema, UserUpdateSchema, UserEnrollSchema, UserEnrollBulkSchema, ClassSchema
+import loaders
+from services.search_service import name_filter
 from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
+from utils.query_budget import query_budget
+from utils.request_args import uuid_arg
+from utils.table_versions import conditional
+from utils.fieldsets import sparse_fieldset, requested_fields
+from utils.streaming import streamable
 
 user_bp = Blueprint("user", __name__, url_prefix="/api/users")
 
 # ---------- GET /users ----------
 @user_bp.route("/", methods=["GET"])
 @user_bp.response(200, UserBaseSchema(many=True))
+@conditional(*loaders.USER_TABLES)
+@sparse_fieldset(UserBaseSchema(many=True))
+@streamable()
+@query_budget(2)
 def get_users():
-    """List all users (optionally filtered by university or search query)"""
-    university_id = request.args.get("university_id")
+    """List all users (optionally filtered by university or search query)
+
+    ``stream=true`` sends the same array as a chunked stream.
+    """
+    university_id = uuid_arg("university_id")
     search = request.args.get("q")
 
-    q = User.query.join(User.university)
+    q = User.query.join(User.university).options(*loaders.USER.options(**requested_fields()))
     if university_id:
         q = q.filter(User.university_id == university_id)
     if search:
-        q = q.filter(User.name.ilike(f"%{search}%"))
+        q = q.filter(name_filter(User, search))
 
-    return q.order_by(User.created_at.desc()).all()
+    return q.order_by(User.created_at.desc())
 
 
 # ---------- GET /users/<id> ----------
 @user_bp.route("/<uuid:user_id>", methods=["GET"])
 @user_bp.response(200, UserBaseSchema)
+@conditional(*loaders.USER_TABLES)
+@sparse_fieldset(UserBaseSchema())
+@query_budget(2)
 def get_user(user_id):
     """Get a single user"""
-    return User.query.get_or_404(user_id)
+    return User.query.options(*loaders.USER.options(**requested_fields())).get_or_404(user_id)
 
 
 # ---------- POST /users ----------
@@ -114,10 +131,13 @@ def login_user(data):
 # ---------- GET /users/<id>/classes ----------
 @user_bp.route("/<uuid:user_id>/classes", methods=["GET"])
 @user_bp.response(200, ClassSchema(many=True))
+@conditional("user", "user_class", *loaders.CLASS_TABLES)
+@sparse_fieldset(ClassSchema(many=True))
+@query_budget(3)
 def get_user_classes(user_id):
     """Get all classes user is enrolled in"""
     user = User.query.get_or_404(user_id)
-    return user.classes
+    return Class.query.with_parent(user, User.classes).options(*loaders.CLASS.options(**requested_fields())).all()
 
 
 # ---------- POST /users/<id>/classes ----------
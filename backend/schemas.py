@@ -1,4 +1,9 @@
-from marshmallow import Schema, fields
+import datetime
+from marshmallow import Schema, fields, validate
+from utils.pagination import MAX_PAGE_SIZE
+from utils.fieldsets import FieldsetQuerySchema
+from utils.streaming import StreamQuerySchema
+from services.import_service import IMPORT_FORMATS
 
 # ---------- USER ----------
 class UniversityMiniSchema(Schema):
@@ -54,12 +59,17 @@ class ClassMiniSchema(Schema):
 class UniversitySchema(Schema):
     id = fields.UUID(dump_only=True)
     name = fields.Str(required=True)
-    users = fields.Nested(UserBaseSchema, many=True, dump_only=True)
-    classes = fields.Nested(ClassMiniSchema, many=True, dump_only=True)
 
-    # automatically derived counts
-    user_count = fields.Function(lambda obj: len(getattr(obj, "users", [])))
-    class_count = fields.Function(lambda obj: len(getattr(obj, "classes", [])))
+    # counts only: members, classes and discussions are paged sub-resources
+    # (GET /universities/<id>/users, /classes, /discussions)
+    user_count = fields.Int(dump_only=True)
+    class_count = fields.Int(dump_only=True)
+    discussion_count = fields.Int(dump_only=True)
+
+
+class PageQuerySchema(FieldsetQuerySchema):
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str()
 
 
 class UniversityCreateSchema(Schema):
@@ -95,6 +105,19 @@ class ClassGroupUpdateSchema(Schema):
     name = fields.Str()
     description = fields.Str()
 
+
+class ClassGroupRegroupSchema(Schema):
+    threshold = fields.Float(load_default=0.6, validate=validate.Range(min=0, max=1, min_inclusive=False))
+
+
+class ClassGroupRegroupResultSchema(Schema):
+    classes = fields.Int()
+    groups = fields.Int()
+    groups_created = fields.Int()
+    groups_removed = fields.Int()
+    classes_moved = fields.Int()
+    seconds = fields.Float()
+
 class TagMiniSchema(Schema):
     id = fields.UUID()
     name = fields.Str()
@@ -103,7 +126,7 @@ class TagMiniSchema(Schema):
 class TagSchema(Schema):
     id = fields.UUID(dump_only=True)
     name = fields.Str(required=True)
-    class_count = fields.Function(lambda obj: len(getattr(obj, "classes", [])))
+    class_count = fields.Int(dump_only=True)
 
 
 class TagCreateSchema(Schema):
@@ -114,6 +137,10 @@ class TagUpdateSchema(Schema):
     name = fields.Str(required=True)
 
 
+class TagMergeSchema(Schema):
+    target_id = fields.UUID(required=True)
+
+
 class ClassSchema(Schema):
     id = fields.UUID(dump_only=True)
     name = fields.Str(required=True)
@@ -121,8 +148,8 @@ class ClassSchema(Schema):
     university = fields.Pluck(UniversityMiniSchema, "name", dump_only=True, attribute="university")
     class_group_id = fields.UUID(dump_only=True)
     class_group = fields.Pluck(ClassGroupMiniSchema, "name", dump_only=True, attribute="class_group")
-    discussion_count = fields.Function(lambda obj: len(getattr(obj, "discussions", [])))
-    enrolled_count = fields.Function(lambda obj: len(getattr(obj, "enrolled_users", [])))
+    discussion_count = fields.Int(dump_only=True)
+    enrolled_count = fields.Int(dump_only=True)
     tags = fields.Nested(TagMiniSchema, many=True, dump_only=True)
     group_id = fields.Function(lambda obj: str(obj.group_map.group_id) if getattr(obj, "group_map", None) else None)
     group_label = fields.Function(
@@ -141,6 +168,40 @@ class ClassUpdateSchema(Schema):
     tag_ids = fields.List(fields.UUID())
 
 
+class ClassImportQuerySchema(Schema):
+    format = fields.Str(validate=validate.OneOf(IMPORT_FORMATS), metadata={
+        "description": "Input format (default: from Content-Type, text/csv or application/x-ndjson)",
+    })
+    group = fields.Bool(load_default=True, metadata={
+        "description": "Group each imported chunk now (false: queue the classes for the grouping worker)",
+    })
+
+
+class ClassImportErrorSchema(Schema):
+    line = fields.Int()
+    error = fields.Str()
+
+
+class ClassImportResultSchema(Schema):
+    imported = fields.Int()
+    failed = fields.Int()
+    grouped = fields.Int()
+    queued = fields.Int()
+    errors = fields.Nested(ClassImportErrorSchema, many=True)
+    errors_truncated = fields.Bool()
+    seconds = fields.Float()
+
+
+class GroupingJobSchema(Schema):
+    id = fields.UUID(dump_only=True)
+    class_id = fields.UUID(dump_only=True)
+    status = fields.Str(dump_only=True)
+    attempts = fields.Int(dump_only=True)
+    error = fields.Str(dump_only=True, allow_none=True)
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
+
+
 # ---------- REPLY ----------
 class ReplySchema(Schema):
     id = fields.UUID(dump_only=True)
@@ -165,9 +226,11 @@ class ReplyUpdateSchema(Schema):
     body = fields.Str(required=True)
 
 
-class ReplyQuerySchema(Schema):
+class ReplyQuerySchema(FieldsetQuerySchema, StreamQuerySchema):
     discussion_id = fields.UUID()
     user_id = fields.UUID()
+    limit = fields.Int(validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str()
 
 
 # ---------- DISCUSSION ----------
@@ -184,7 +247,24 @@ class DiscussionSchema(Schema):
     class_name = fields.Pluck(ClassMiniSchema, "name", dump_only=True, attribute="class_")
     university = fields.Pluck(UniversityMiniSchema, "name", dump_only=True, attribute="class_.university")
     replies = fields.Nested(ReplySchema, many=True, dump_only=True)
-    reply_count = fields.Function(lambda obj: len(getattr(obj, "replies", [])))
+    reply_count = fields.Int(dump_only=True)
+
+
+class DiscussionSummarySchema(Schema):
+    """Feed card: the stored preview instead of the body, and no replies."""
+    id = fields.UUID(dump_only=True)
+    title = fields.Str(dump_only=True)
+    preview = fields.Str(dump_only=True)
+    created_at = fields.DateTime(dump_only=True)
+    last_activity_at = fields.DateTime(dump_only=True)
+
+    user_id = fields.UUID(dump_only=True)
+    class_id = fields.UUID(dump_only=True)
+
+    author = fields.Pluck(UserBaseSchema, "name", dump_only=True, attribute="user")
+    class_name = fields.Pluck(ClassMiniSchema, "name", dump_only=True, attribute="class_")
+    university = fields.Pluck(UniversityMiniSchema, "name", dump_only=True, attribute="class_.university")
+    reply_count = fields.Int(dump_only=True)
 
 
 class DiscussionCreateSchema(Schema):
@@ -199,9 +279,87 @@ class DiscussionUpdateSchema(Schema):
     body = fields.Str()
 
 
-class DiscussionQuerySchema(Schema):
+class DiscussionQuerySchema(FieldsetQuerySchema):
     class_id = fields.UUID()
     university_id = fields.UUID()
     user_id = fields.UUID()
     class_group_id = fields.UUID()
-    q = fields.Str()
\ No newline at end of file
+    q = fields.Str()
+    limit = fields.Int(validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.Str()
+
+class DiscussionExportQuerySchema(Schema):
+    since = fields.AwareDateTime(default_timezone=datetime.timezone.utc, metadata={
+        "description": "Only discussions created at or after this time (ISO 8601, UTC if no offset)",
+    })
+    class_group_id = fields.UUID()
+
+
+class ReplyExportSchema(Schema):
+    id = fields.UUID()
+    body = fields.Str()
+    created_at = fields.DateTime()
+    user_id = fields.UUID()
+    author = fields.Str()
+
+
+class DiscussionExportSchema(Schema):
+    """One NDJSON line of GET /discussions/export (dumped from plain rows)."""
+    id = fields.UUID()
+    title = fields.Str()
+    body = fields.Str()
+    created_at = fields.DateTime()
+    last_activity_at = fields.DateTime()
+    reply_count = fields.Int()
+    user_id = fields.UUID()
+    author = fields.Str()
+    class_id = fields.UUID()
+    class_name = fields.Str()
+    class_group_id = fields.UUID(allow_none=True)
+    university_id = fields.UUID()
+    university = fields.Str()
+    replies = fields.Nested(ReplyExportSchema, many=True)
+
+# ---------- SEARCH ----------
+class SearchQuerySchema(FieldsetQuerySchema):
+    q = fields.Str(required=True, validate=validate.Length(min=1))
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    offset = fields.Int(load_default=0, validate=validate.Range(min=0))
+
+
+class DiscussionBriefSchema(DiscussionSchema):
+    class Meta:
+        exclude = ("replies",)
+
+
+class DiscussionSearchResultSchema(Schema):
+    discussion = fields.Nested(DiscussionBriefSchema, dump_only=True)
+    rank = fields.Float(dump_only=True)
+    matched_in = fields.Str(dump_only=True)
+    snippet = fields.Str(dump_only=True)
+
+
+class TypeaheadQuerySchema(FieldsetQuerySchema):
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=100))
+    type = fields.Str(validate=validate.OneOf(["class", "university", "user"]))
+    limit = fields.Int(load_default=10, validate=validate.Range(min=1, max=50))
+
+
+class TypeaheadResultSchema(Schema):
+    type = fields.Str(dump_only=True)
+    id = fields.UUID(dump_only=True)
+    name = fields.Str(dump_only=True)
+
+
+# ---------- CACHE ----------
+class CacheStatsSchema(Schema):
+    hits = fields.Int(dump_only=True)
+    misses = fields.Int(dump_only=True)
+    hit_rate = fields.Float(dump_only=True, allow_none=True)
+    expired = fields.Int(dump_only=True)
+    evicted = fields.Int(dump_only=True)
+    invalidated = fields.Int(dump_only=True)
+    entries = fields.Int(dump_only=True)
+    bytes = fields.Int(dump_only=True)
+    max_bytes = fields.Int(dump_only=True)
+    coalesced = fields.Int(dump_only=True, metadata={"description": "Requests served by waiting on an identical in-flight one"})
@@ -1,7 +1,7 @@
 import os
 from app import app, db
 from models import User, University, Class, Tag, Discussion, Reply
-from services.grouping_service import assign_class_to_group
+from services.grouping_service import assign_class_to_group, grouping_batch
 from models import ClassGroup, ClassGroupMap
 from werkzeug.security import generate_password_hash
 
@@ -340,8 +340,9 @@ def seed_data():
 
         # ---------- Group classes across universities ----------
         print("Assigning classes to cross-university groups…")
-        for c in Class.query.all():
-            assign_class_to_group(c)
+        with grouping_batch():
+            for c in Class.query.all():
+                assign_class_to_group(c)
         print(f"Groups created: {ClassGroup.query.count()}")
 
         # ---------- Discussions (expanded bodies; student-made, realistic mix) ----------
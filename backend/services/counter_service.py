@@ -0,0 +1,179 @@
+# services/counter_service.py
+from sqlalchemy import event, text
+from models import Class, Discussion, Reply, User, class_tag, user_class
+
+
+def _count_triggers(child: str, fk: str, parent: str, counter: str, movable: bool = False) -> list[str]:
+    """Triggers keeping ``parent.counter`` equal to the number of ``child`` rows pointing at it.
+
+    They run inside the writing statement, so the counter commits or rolls
+    back with the row itself (FK cascade deletes fire them too).
+    """
+    name = f"{child}_{counter}"
+    statements = [
+        f"""CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON "{child}" BEGIN
+            UPDATE "{parent}" SET {counter} = {counter} + 1 WHERE id = new.{fk};
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON "{child}" BEGIN
+            UPDATE "{parent}" SET {counter} = {counter} - 1 WHERE id = old.{fk};
+        END""",
+    ]
+    if movable:
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {fk} ON "{child}"
+            WHEN old.{fk} IS NOT new.{fk} BEGIN
+                UPDATE "{parent}" SET {counter} = {counter} - 1 WHERE id = old.{fk};
+                UPDATE "{parent}" SET {counter} = {counter} + 1 WHERE id = new.{fk};
+            END"""
+        )
+    return statements
+
+
+# (child table, FK column, parent table, counter column, FK can change)
+COUNTERS = [
+    ("discussion", "class_id", "classes", "discussion_count", True),
+    ("user_class", "class_id", "classes", "enrolled_count", False),
+    ("reply", "discussion_id", "discussion", "reply_count", True),
+    ("class_tag", "tag_id", "tag", "class_count", False),
+    ("user", "university_id", "university", "user_count", True),
+    ("classes", "university_id", "university", "class_count", True),
+]
+
+# discussion.preview length (characters, including the trailing ellipsis)
+PREVIEW_LENGTH = 200
+
+
+def _preview(body: str) -> str:
+    # body on one line, cut at PREVIEW_LENGTH with an ellipsis
+    flat = f"trim(replace(replace(replace({body}, char(13), ' '), char(10), ' '), char(9), ' '))"
+    return (
+        f"CASE WHEN length({flat}) > {PREVIEW_LENGTH} "
+        f"THEN rtrim(substr({flat}, 1, {PREVIEW_LENGTH - 1})) || '…' ELSE {flat} END"
+    )
+
+
+# newest reply, or the discussion itself when it has none
+_LAST_ACTIVITY = """max(discussion.created_at, coalesce(
+    (SELECT max(reply.created_at) FROM reply WHERE reply.discussion_id = discussion.id), discussion.created_at))"""
+
+# table -> summary-column triggers (discussion.preview, discussion.last_activity_at)
+SUMMARY_DDL = {
+    "discussion": [
+        f"""CREATE TRIGGER IF NOT EXISTS discussion_summary_ai AFTER INSERT ON discussion BEGIN
+            UPDATE discussion SET preview = {_preview("new.body")},
+                last_activity_at = coalesce(new.last_activity_at, new.created_at)
+            WHERE id = new.id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS discussion_summary_au AFTER UPDATE OF body ON discussion
+        WHEN old.body IS NOT new.body BEGIN
+            UPDATE discussion SET preview = {_preview("new.body")} WHERE id = new.id;
+        END""",
+    ],
+    "reply": [
+        """CREATE TRIGGER IF NOT EXISTS reply_last_activity_ai AFTER INSERT ON reply BEGIN
+            UPDATE discussion SET last_activity_at = max(coalesce(last_activity_at, created_at), new.created_at)
+            WHERE id = new.discussion_id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS reply_last_activity_ad AFTER DELETE ON reply BEGIN
+            UPDATE discussion SET last_activity_at = {_LAST_ACTIVITY} WHERE id = old.discussion_id;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS reply_last_activity_au AFTER UPDATE OF discussion_id ON reply
+        WHEN old.discussion_id IS NOT new.discussion_id BEGIN
+            UPDATE discussion SET last_activity_at = {_LAST_ACTIVITY} WHERE id IN (old.discussion_id, new.discussion_id);
+        END""",
+    ],
+}
+
+# tag_usage: per-(tag, university) class counts. During an FK cascade the parent row is
+# already gone, so a deleted class gives back its tags in a BEFORE DELETE trigger and the
+# class_tag delete trigger then finds no class (and changes nothing).
+_TAG_USAGE_ADD = """INSERT INTO tag_usage (tag_id, university_id, class_count)
+            SELECT {tag}, {university}, 1 FROM {source}
+            ON CONFLICT (tag_id, university_id) DO UPDATE SET class_count = class_count + 1;"""
+_TAG_USAGE_REMOVE = """UPDATE tag_usage SET class_count = class_count - 1 WHERE {match};
+            DELETE FROM tag_usage WHERE {match} AND class_count <= 0;"""
+
+USAGE_DDL = {
+    "class_tag": [
+        f"""CREATE TRIGGER IF NOT EXISTS class_tag_usage_ai AFTER INSERT ON class_tag BEGIN
+            {_TAG_USAGE_ADD.format(tag="new.tag_id", university="university_id", source="classes WHERE id = new.class_id")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS class_tag_usage_ad AFTER DELETE ON class_tag BEGIN
+            {_TAG_USAGE_REMOVE.format(match="tag_id = old.tag_id AND university_id = (SELECT university_id FROM classes WHERE id = old.class_id)")}
+        END""",
+    ],
+    "classes": [
+        f"""CREATE TRIGGER IF NOT EXISTS classes_tag_usage_bd BEFORE DELETE ON classes BEGIN
+            {_TAG_USAGE_REMOVE.format(match="university_id = old.university_id AND tag_id IN (SELECT tag_id FROM class_tag WHERE class_id = old.id)")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS classes_tag_usage_au AFTER UPDATE OF university_id ON classes
+        WHEN old.university_id IS NOT new.university_id BEGIN
+            {_TAG_USAGE_REMOVE.format(match="university_id = old.university_id AND tag_id IN (SELECT tag_id FROM class_tag WHERE class_id = new.id)")}
+            {_TAG_USAGE_ADD.format(tag="tag_id", university="new.university_id", source="class_tag WHERE class_id = new.id")}
+        END""",
+    ],
+}
+
+_EXPECTED_TAG_USAGE = """SELECT class_tag.tag_id, classes.university_id, count(*) FROM class_tag
+    JOIN classes ON classes.id = class_tag.class_id GROUP BY class_tag.tag_id, classes.university_id"""
+
+# child table -> trigger DDL, installed when that table is created
+COUNTER_DDL = {}
+for _child, _fk, _parent, _counter, _movable in COUNTERS:
+    COUNTER_DDL.setdefault(_child, []).extend(_count_triggers(_child, _fk, _parent, _counter, _movable))
+for _ddl in (SUMMARY_DDL, USAGE_DDL):
+    for _table, _statements in _ddl.items():
+        COUNTER_DDL.setdefault(_table, []).extend(_statements)
+
+# table -> other tables its triggers write (see utils/table_versions.py)
+TRIGGER_WRITES = {}
+for _child, _fk, _parent, _counter, _movable in COUNTERS:
+    TRIGGER_WRITES.setdefault(_child, set()).add(_parent)
+for _table in SUMMARY_DDL:
+    TRIGGER_WRITES.setdefault(_table, set()).add("discussion")
+for _table in USAGE_DDL:
+    TRIGGER_WRITES.setdefault(_table, set()).add("tag_usage")
+
+
+def install_counter_triggers(connection, tables=tuple(COUNTER_DDL)):
+    """Create the counter and summary triggers (no-op when present)."""
+    for table in tables:
+        for statement in COUNTER_DDL[table]:
+            connection.execute(text(statement))
+
+
+def repair_counters(connection) -> dict[str, int]:
+    """Recompute every counter, discussion summary column and the tag_usage rollup.
+
+    Returns how many rows were out of step, keyed by "table.column".
+    """
+    fixed = {}
+    for child, fk, parent, counter, _ in COUNTERS:
+        actual = f'(SELECT count(*) FROM "{child}" WHERE "{child}".{fk} = "{parent}".id)'
+        result = connection.execute(
+            text(f'UPDATE "{parent}" SET {counter} = {actual} WHERE {counter} != {actual}')
+        )
+        fixed[f"{parent}.{counter}"] = result.rowcount
+    for column, actual in (("preview", _preview("body")), ("last_activity_at", _LAST_ACTIVITY)):
+        result = connection.execute(
+            text(f"UPDATE discussion SET {column} = {actual} WHERE {column} IS NOT {actual}")
+        )
+        fixed[f"discussion.{column}"] = result.rowcount
+
+    actual = "SELECT tag_id, university_id, class_count FROM tag_usage"
+    drift = connection.execute(text(f"""SELECT
+        (SELECT count(*) FROM ({_EXPECTED_TAG_USAGE} EXCEPT {actual}))
+        + (SELECT count(*) FROM ({actual} EXCEPT {_EXPECTED_TAG_USAGE}))""")).scalar()
+    if drift:
+        connection.execute(text("DELETE FROM tag_usage"))
+        connection.execute(text(f"INSERT INTO tag_usage (tag_id, university_id, class_count) {_EXPECTED_TAG_USAGE}"))
+    fixed["tag_usage"] = drift
+    return fixed
+
+
+def _create_counter_triggers(target, connection, **kw):
+    install_counter_triggers(connection, [target.name])
+
+
+for _table in (Discussion.__table__, user_class, Reply.__table__, class_tag, User.__table__, Class.__table__):
+    event.listen(_table, "after_create", _create_counter_triggers)
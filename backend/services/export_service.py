@@ -0,0 +1,63 @@
+# services/export_service.py
+import datetime
+import json
+from sqlalchemy import select
+from models import db, Class, Discussion, Reply, University, User
+from schemas import DiscussionExportSchema
+
+# discussions fetched (and replies looked up) per round trip
+EXPORT_CHUNK = 500
+
+_discussion_export = DiscussionExportSchema(many=True)
+
+
+def export_discussions(since: datetime.datetime | None = None, class_group_id=None, chunk_size: int = EXPORT_CHUNK):
+    """Yield the forum as NDJSON lines, one discussion (with its replies) per line, oldest first.
+
+    Discussions come from a single SELECT read ``chunk_size`` rows at a
+    time (yield_per), and the replies of each chunk from one more query,
+    so memory holds one chunk whatever the export size. Rows are plain
+    tuples, never ORM objects.
+
+    ``since``: only discussions created at or after it. The SELECT keeps
+    its read transaction open until the last line is consumed, which
+    blocks writers under the default (rollback journal) SQLite profile;
+    the production profile's WAL does not.
+    """
+    stmt = (
+        select(
+            Discussion.id, Discussion.title, Discussion.body, Discussion.created_at, Discussion.last_activity_at,
+            Discussion.reply_count, Discussion.user_id, User.name.label("author"), Discussion.class_id,
+            Class.name.label("class_name"), Class.class_group_id, Class.university_id,
+            University.name.label("university"),
+        )
+        .join(User, User.id == Discussion.user_id)
+        .join(Class, Class.id == Discussion.class_id)
+        .join(University, University.id == Class.university_id)
+        .order_by(Discussion.created_at, Discussion.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if since is not None:
+        if since.tzinfo is not None:
+            # stored as naive UTC
+            since = since.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        stmt = stmt.where(Discussion.created_at >= since)
+    if class_group_id is not None:
+        stmt = stmt.where(Class.class_group_id == class_group_id)
+
+    for chunk in db.session.execute(stmt).mappings().partitions():
+        discussions = [dict(row, replies=[]) for row in chunk]
+        by_id = {d["id"]: d for d in discussions}
+        for reply in _replies_of(list(by_id)):
+            by_id[reply["discussion_id"]]["replies"].append(reply)
+        for line in _discussion_export.dump(discussions):
+            yield json.dumps(line) + "\n"
+
+
+def _replies_of(discussion_ids: list):
+    return db.session.execute(
+        select(Reply.id, Reply.body, Reply.created_at, Reply.discussion_id, Reply.user_id, User.name.label("author"))
+        .join(User, User.id == Reply.user_id)
+        .where(Reply.discussion_id.in_(discussion_ids))
+        .order_by(Reply.discussion_id, Reply.created_at, Reply.id)
+    ).mappings()
@@ -0,0 +1,166 @@
+# services/grouping_queue.py
+import datetime
+import logging
+import threading
+from flask import current_app
+from sqlalchemy import update, insert
+from models import db, Class, GroupingJob, class_tag
+from sqlalchemy.orm import selectinload
+from services.grouping_service import assign_class_to_group, grouping_batch
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+ENQUEUE_BATCH = 500
+
+def enqueue_grouping(class_id) -> GroupingJob:
+    """Queue grouping for a class in the current transaction (caller commits).
+
+    Repeated requests for a class that still has a pending job coalesce onto it.
+    """
+    # conditional touch: a job the worker already claimed must not absorb this write
+    touched = db.session.execute(
+        update(GroupingJob)
+        .where(GroupingJob.class_id == class_id, GroupingJob.status == "pending")
+        .values(updated_at=datetime.datetime.now(datetime.timezone.utc))
+    )
+    if touched.rowcount:
+        return GroupingJob.query.filter_by(class_id=class_id, status="pending").first()
+    job = GroupingJob(class_id=class_id, status="pending")
+    db.session.add(job)
+    return job
+
+def enqueue_grouping_many(class_ids) -> int:
+    """Bulk enqueue_grouping, in batches. Returns the number of classes queued."""
+    class_ids = list(dict.fromkeys(class_ids))
+    now = datetime.datetime.now(datetime.timezone.utc)
+    for start in range(0, len(class_ids), ENQUEUE_BATCH):
+        batch = class_ids[start:start + ENQUEUE_BATCH]
+        db.session.execute(
+            update(GroupingJob)
+            .where(GroupingJob.class_id.in_(batch), GroupingJob.status == "pending")
+            .values(updated_at=now)
+        )
+        pending = {
+            class_id for (class_id,) in db.session.query(GroupingJob.class_id)
+            .filter(GroupingJob.class_id.in_(batch), GroupingJob.status == "pending")
+        }
+        fresh = [cid for cid in batch if cid not in pending]
+        if fresh:
+            db.session.execute(
+                insert(GroupingJob),
+                [{"class_id": cid, "status": "pending", "created_at": now, "updated_at": now} for cid in fresh],
+            )
+    return len(class_ids)
+
+def classes_with_tag(tag_id) -> list:
+    """Ids of classes whose signature depends on the tag (via class_tag)."""
+    return [
+        class_id for (class_id,) in
+        db.session.query(class_tag.c.class_id).filter(class_tag.c.tag_id == tag_id)
+    ]
+
+def dispatch_grouping():
+    """After commit: wake the worker, or drain the queue inline when GROUPING_ASYNC is off."""
+    worker = current_app.extensions.get("grouping_worker")
+    if worker:
+        worker.wake()
+    else:
+        process_pending_jobs()
+
+def process_pending_jobs(limit: int = 100) -> int:
+    """Run up to ``limit`` pending jobs, oldest first, as one grouping batch.
+
+    Returns how many jobs were claimed. If the batch fails, its jobs are
+    retried one by one so a single bad class can't block the rest.
+    """
+    ids = [
+        job_id for (job_id,) in db.session.query(GroupingJob.id)
+        .filter_by(status="pending")
+        .order_by(GroupingJob.created_at.asc())
+        .limit(limit)
+    ]
+    if not ids:
+        return 0
+    # conditional claim so concurrent workers never run the same job
+    claimed = db.session.execute(
+        update(GroupingJob)
+        .where(GroupingJob.id.in_(ids), GroupingJob.status == "pending")
+        .values(status="running", attempts=GroupingJob.attempts + 1,
+                updated_at=datetime.datetime.now(datetime.timezone.utc))
+        .returning(GroupingJob.id)
+    ).scalars().all()
+    db.session.commit()
+
+    try:
+        with grouping_batch():
+            jobs = GroupingJob.query.filter(GroupingJob.id.in_(claimed)).all()
+            classes = {
+                c.id: c for c in Class.query
+                .filter(Class.id.in_([j.class_id for j in jobs]))
+                .options(selectinload(Class.tags))
+            }
+            for job in jobs:
+                if job.class_id in classes:
+                    assign_class_to_group(classes[job.class_id])
+                job.status = "done"
+                job.error = None
+    except Exception:
+        logger.warning("Grouping batch of %d jobs failed; retrying individually", len(claimed))
+        for job_id in claimed:
+            _run_job(job_id)
+    return len(claimed)
+
+def reset_stale_jobs() -> int:
+    """Requeue jobs left running by a process that died mid-job."""
+    result = db.session.execute(
+        update(GroupingJob).where(GroupingJob.status == "running").values(status="pending")
+    )
+    db.session.commit()
+    return result.rowcount
+
+def _run_job(job_id):
+    try:
+        job = db.session.get(GroupingJob, job_id)
+        class_obj = db.session.get(Class, job.class_id)
+        if class_obj:
+            assign_class_to_group(class_obj)
+        job.status = "done"
+        job.error = None
+    except Exception as exc:
+        db.session.rollback()
+        job = db.session.get(GroupingJob, job_id)
+        if job is None:
+            return  # the class (and its jobs) was deleted mid-run
+        logger.exception("Grouping job %s failed", job_id)
+        job.status = "pending" if job.attempts < MAX_ATTEMPTS else "failed"
+        job.error = str(exc)
+    db.session.commit()
+
+class GroupingWorker:
+    """Background thread that drains the grouping queue after responses are sent."""
+
+    def __init__(self, app, poll_interval: float = 5.0):
+        self.app = app
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="grouping-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self.app.app_context():
+                try:
+                    while process_pending_jobs():
+                        pass
+                except Exception:
+                    logger.exception("Grouping worker pass failed")
+                finally:
+                    db.session.remove()
@@ -1,8 +1,13 @@
 # services/grouping_service.py
+import threading
+from contextlib import contextmanager
 from models import db, Class
 from models import Tag  # your Tag model
-from models import ClassGroup, ClassGroupMap
+from models import ClassGroup, ClassGroupMap, ClassGroupToken, ClassGroupSketch, ClassGroupBand
+from flask import current_app
+from sqlalchemy import insert, literal_column
 from utils.grouping import make_signature, normalize_tokens, jaccard
+from utils.grouping import minhash, lsh_band_keys, pack_sketch
 
 def assign_class_to_group(class_obj: Class, threshold: float = 0.6):
     """Attach class to an existing group by signature/similarity or create a new one."""
@@ -10,21 +15,24 @@ def assign_class_to_group(class_obj: Class, threshold: float = 0.6):
     sig = make_signature(class_obj.name, tag_names)
 
     # 1) exact signature
-    group = ClassGroup.query.filter_by(signature=sig).first()
+    group = _group_by_signature(sig)
     if group:
         _link(class_obj, group)
         return group
 
-    # 2) fuzzy (token Jaccard) across existing groups
+    # 2) fuzzy (token Jaccard) across groups sharing at least one token;
+    #    groups with no shared token score 0 and can never win
+    #    (the "minhash" engine narrows this further to LSH bucket collisions)
     new_tokens = set(normalize_tokens(class_obj.name, tag_names))
-    best, best_score = None, 0.0
-    for g in ClassGroup.query.all():
-        g_tokens = set(g.signature.split("-"))
+    best_id, best_score = None, 0.0
+    for group_id, signature in _candidate_groups(new_tokens):
+        g_tokens = _signature_tokens(signature)
         score = jaccard(new_tokens, g_tokens)
         if score > best_score:
-            best, best_score = g, score
+            best_id, best_score = group_id, score
 
-    if best and best_score >= threshold:
+    if best_id and best_score >= threshold:
+        best = db.session.get(ClassGroup, best_id)
         _link(class_obj, best)
         return best
 
@@ -32,14 +40,195 @@ def assign_class_to_group(class_obj: Class, threshold: float = 0.6):
     label = _label_from_tokens(list(new_tokens))
     group = ClassGroup(name=label, signature=sig, label=label)
     db.session.add(group)
+    index_group(group)
     db.session.flush()  # get group.id
+    batch = _current_batch()
+    if batch:
+        batch.remember(group)
     _link(class_obj, group)
     return group
 
+class GroupingBatch:
+    """Links and signature lookups buffered by grouping_batch()."""
+
+    def __init__(self):
+        self.links = {}       # class_id -> group_id
+        self.groups = {}      # signature -> ClassGroup (or None when known missing)
+        self.postings = {}    # token / LSH band key -> {group_id}
+        self.signatures = {}  # group_id -> signature
+        self.ranks = {}       # group_id -> candidate order (see _candidate_groups)
+
+    def remember(self, group: ClassGroup):
+        """Make a group created inside the batch visible to later lookups."""
+        self.groups[group.signature] = group
+        self.signatures[group.id] = group.signature
+        # newer than every stored group, so after them in rowid order
+        self.ranks[group.id] = (1, len(self.ranks))
+        # only keys already loaded: an absent key is fetched later, and the
+        # group (flushed before this) comes back with the other groups under it
+        for key in _posting_keys(_signature_tokens(group.signature)):
+            if key in self.postings:
+                self.postings[key].add(group.id)
+
+_state = threading.local()
+
+@contextmanager
+def grouping_batch():
+    """Group many classes in one transaction.
+
+    Inside the block assign_class_to_group caches signature -> group
+    lookups and buffers class/group links instead of querying and
+    committing per class; everything is written with one commit on exit.
+    Autoflush is off meanwhile: lookups go through the batch's caches, so
+    the class_group_id updates can wait for that one flush.
+    Nested blocks join the outer batch.
+    """
+    if _current_batch():
+        yield _current_batch()
+        return
+    batch = _state.batch = GroupingBatch()
+    try:
+        with db.session.no_autoflush:
+            yield batch
+        _flush_links(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        _state.batch = None
+
+def _current_batch() -> GroupingBatch | None:
+    return getattr(_state, "batch", None)
+
+def _group_by_signature(sig: str) -> ClassGroup | None:
+    batch = _current_batch()
+    if batch is None:
+        return ClassGroup.query.filter_by(signature=sig).first()
+    if sig not in batch.groups:
+        batch.groups[sig] = ClassGroup.query.filter_by(signature=sig).first()
+    return batch.groups[sig]
+
+def _flush_links(batch: GroupingBatch, chunk: int = 500):
+    class_ids = list(batch.links)
+    for start in range(0, len(class_ids), chunk):
+        ids = class_ids[start:start + chunk]
+        existing = ClassGroupMap.query.filter(ClassGroupMap.class_id.in_(ids)).all()
+        for mapping in existing:
+            mapping.group_id = batch.links[mapping.class_id]
+        mapped = {m.class_id for m in existing}
+        db.session.add_all(
+            ClassGroupMap(class_id=cid, group_id=batch.links[cid]) for cid in ids if cid not in mapped
+        )
+
+def index_group(group: ClassGroup):
+    """(Re)build the token postings and LSH sketch/buckets for a group from its signature."""
+    tokens = _signature_tokens(group.signature)
+    bands, rows = _lsh_params()
+    sketch = minhash(tokens, bands * rows)
+    group.tokens = [ClassGroupToken(token=t) for t in sorted(tokens)]
+    group.sketch = ClassGroupSketch(bands=bands, rows=rows, sketch=pack_sketch(sketch))
+    group.bands = [ClassGroupBand(band_key=k) for k in sorted(set(lsh_band_keys(sketch, bands, rows)))]
+
+def rebuild_group_index() -> int:
+    """Rebuild postings, sketches and buckets for every group. Returns the number of groups indexed."""
+    ClassGroupToken.query.delete()
+    ClassGroupSketch.query.delete()
+    ClassGroupBand.query.delete()
+    groups = db.session.query(ClassGroup.id, ClassGroup.signature).all()
+    insert_group_index(groups)
+    db.session.commit()
+    return len(groups)
+
+def insert_group_index(groups: list[tuple]):
+    """Bulk-insert postings, sketches and buckets for (group_id, signature) pairs."""
+    bands, rows = _lsh_params()
+    tokens, sketches, buckets = [], [], []
+    for group_id, signature in groups:
+        sig_tokens = _signature_tokens(signature)
+        sketch = minhash(sig_tokens, bands * rows)
+        tokens += [{"token": t, "group_id": group_id} for t in sig_tokens]
+        sketches.append({"group_id": group_id, "bands": bands, "rows": rows, "sketch": pack_sketch(sketch)})
+        buckets += [{"band_key": k, "group_id": group_id} for k in set(lsh_band_keys(sketch, bands, rows))]
+    for model, rows_ in ((ClassGroupToken, tokens), (ClassGroupSketch, sketches), (ClassGroupBand, buckets)):
+        if rows_:
+            db.session.execute(insert(model), rows_)
+
+def group_index_stale() -> bool:
+    """True when groups exist that lack postings or were sketched with other LSH params."""
+    if ClassGroup.query.first() is None:
+        return False
+    bands, rows = _lsh_params()
+    indexed = ClassGroupSketch.query.filter_by(bands=bands, rows=rows).count()
+    return indexed != ClassGroup.query.count() or ClassGroupToken.query.first() is None
+
+def _candidate_groups(tokens: set[str]) -> list[tuple]:
+    """(group_id, signature) of every group sharing a posting key with ``tokens``.
+
+    In rowid (creation) order, the order a full scan of class_group visits
+    them in, so the first of equally scored groups still wins.
+    """
+    if not tokens:
+        return []
+    keys = _posting_keys(tokens)
+    batch = _current_batch()
+    if batch is None:
+        return db.session.query(ClassGroup.id, ClassGroup.signature).filter(
+            ClassGroup.id.in_(_posting_query(keys).distinct())
+        ).order_by(_ROWID).all()
+
+    missing = [k for k in keys if k not in batch.postings]
+    if missing:
+        for k in missing:
+            batch.postings[k] = set()
+        column = _posting_column()
+        rows = (
+            db.session.query(column, ClassGroup.id, ClassGroup.signature, _ROWID)
+            .join(ClassGroup, ClassGroup.id == column.table.c.group_id)
+            .filter(column.in_(missing))
+        )
+        for key, group_id, signature, rowid in rows:
+            batch.postings[key].add(group_id)
+            batch.signatures[group_id] = signature
+            batch.ranks.setdefault(group_id, (0, rowid))
+    ids = set().union(*(batch.postings[k] for k in keys))
+    return [(group_id, batch.signatures[group_id]) for group_id in sorted(ids, key=batch.ranks.__getitem__)]
+
+_ROWID = literal_column("class_group.rowid")
+
+def _minhash_engine() -> bool:
+    return current_app.config.get("GROUPING_ENGINE", "exact") == "minhash"
+
+def _posting_keys(tokens: set[str]) -> list:
+    """Index keys a token set is looked up by: its tokens, or its LSH band keys."""
+    if _minhash_engine():
+        bands, rows = _lsh_params()
+        return lsh_band_keys(minhash(tokens, bands * rows), bands, rows)
+    return list(tokens)
+
+def _posting_column():
+    return ClassGroupBand.band_key if _minhash_engine() else ClassGroupToken.token
+
+def _posting_query(keys: list):
+    column = _posting_column()
+    return db.session.query(column.table.c.group_id).filter(column.in_(keys))
+
+def _lsh_params() -> tuple[int, int]:
+    return current_app.config.get("GROUPING_LSH_BANDS", 20), current_app.config.get("GROUPING_LSH_ROWS", 3)
+
+def _signature_tokens(signature: str) -> set[str]:
+    return set(signature.split("-"))
+
 def _link(class_obj: Class, group: ClassGroup):
     # Set the direct foreign key
     class_obj.class_group_id = group.id
-    
+
+    # Inside grouping_batch() the mapping is written when the batch flushes
+    batch = _current_batch()
+    if batch:
+        batch.links[class_obj.id] = group.id
+        return
+
     # Also create/update the mapping table entry
     mapping = ClassGroupMap.query.filter_by(class_id=class_obj.id).first()
     if mapping:
@@ -0,0 +1,202 @@
+# services/import_service.py
+import csv
+import io
+import json
+import logging
+import re
+import time
+import uuid
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import selectinload
+from models import db, Class, Tag, University, class_tag
+from services.grouping_queue import enqueue_grouping_many
+from services.grouping_service import assign_class_to_group, grouping_batch
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+# rows inserted (and grouped) per transaction
+IMPORT_CHUNK = 500
+# per-row errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+# separator of the tags column in CSV (NDJSON may also give a list)
+TAG_SEPARATOR = ";"
+NAME_LENGTH = Class.name.type.length
+# bytes that weren't valid UTF-8, as decoded with errors="surrogateescape"
+_UNDECODABLE = re.compile("[\udc80-\udcff]")
+
+
+class RowError(ValueError):
+    """An import row that can't become a class."""
+
+
+def import_classes(stream, fmt: str, group: bool = True, chunk_size: int = IMPORT_CHUNK) -> dict:
+    """Create classes from a CSV or NDJSON byte stream, ``chunk_size`` rows per transaction.
+
+    Each row has ``name``, ``university_id`` or ``university`` (the name)
+    and optional ``tags`` (tag names or ids). Universities and tags are
+    resolved from maps loaded once up front; only the current chunk is
+    held in memory. Bad rows (unknown university or tag, a name already
+    taken in the university, malformed input) are skipped and reported
+    by line; the other rows of their chunk are still imported.
+
+    ``group``: run grouping over each chunk once it is inserted (one
+    grouping_batch per chunk); otherwise queue the classes for the
+    grouping worker.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}")
+    started = time.perf_counter()
+    universities = _lookup(University)
+    tags = _lookup(Tag)
+    stats = {"imported": 0, "failed": 0, "grouped": 0, "queued": 0}
+    errors = []
+
+    def fail(line, message):
+        stats["failed"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line, "error": message})
+
+    chunk = []
+    for line, record in _records(io.TextIOWrapper(stream, encoding="utf-8-sig", errors="surrogateescape", newline=""), fmt):
+        try:
+            chunk.append((line, *_resolve(record, universities, tags)))
+        except RowError as exc:
+            fail(line, str(exc))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, group, stats, fail)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, group, stats, fail)
+
+    return {
+        **stats,
+        "errors": errors,
+        "errors_truncated": stats["failed"] > len(errors),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _lookup(model) -> dict:
+    # id (as text) and case-folded name -> id; universities and tags are small tables
+    rows = db.session.execute(select(model.id, model.name)).all()
+    return {**{name.casefold(): id_ for id_, name in rows}, **{str(id_): id_ for id_, _ in rows}}
+
+
+def _records(text, fmt: str):
+    """(line number, dict or RowError) per input row, read lazily."""
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        try:
+            for record in reader:
+                if any(isinstance(value, str) and _UNDECODABLE.search(value) for value in record.values()):
+                    record = RowError("Not valid UTF-8")
+                yield reader.line_num, record
+        except csv.Error as exc:
+            yield reader.line_num, RowError(f"Malformed CSV: {exc}")
+        return
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        if _UNDECODABLE.search(raw):
+            yield line, RowError("Not valid UTF-8")
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield line, RowError(f"Malformed JSON: {exc}")
+            continue
+        yield line, record if isinstance(record, dict) else RowError("Expected a JSON object")
+
+
+def _resolve(record, universities: dict, tags: dict) -> tuple:
+    """(name, university_id, tag_ids) for a parsed row, or RowError."""
+    if isinstance(record, RowError):
+        raise record
+    name = _text(record, "name")
+    if not name:
+        raise RowError("name is required")
+    if len(name) > NAME_LENGTH:
+        raise RowError(f"name is longer than {NAME_LENGTH} characters")
+
+    university = _text(record, "university_id") or _text(record, "university")
+    if not university:
+        raise RowError("university_id or university is required")
+    university_id = universities.get(university) or universities.get(university.casefold())
+    if university_id is None:
+        raise RowError(f"Unknown university {university!r}")
+
+    raw_tags = record.get("tags")
+    if raw_tags is None:
+        raw_tags = []
+    elif isinstance(raw_tags, str):
+        raw_tags = raw_tags.split(TAG_SEPARATOR)
+    elif not isinstance(raw_tags, list):
+        raise RowError("tags must be a list or a separator-joined string")
+    elif not all(isinstance(t, str) for t in raw_tags):
+        raise RowError("tags must be tag names or ids (strings)")
+    tag_ids = []
+    for tag in (t.strip() for t in raw_tags):
+        if not tag:
+            continue
+        tag_id = tags.get(tag) or tags.get(tag.casefold())
+        if tag_id is None:
+            raise RowError(f"Unknown tag {tag!r}")
+        tag_ids.append(tag_id)
+    return name, university_id, list(dict.fromkeys(tag_ids))
+
+
+def _text(record, key: str) -> str:
+    # NDJSON values can be any JSON type; CSV gives str, or None for a missing column
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise RowError(f"{key} must be a string")
+    return value.strip()
+
+
+def _import_chunk(chunk: list, group: bool, stats: dict, fail):
+    taken = set(db.session.execute(
+        select(Class.university_id, Class.name)
+        .where(tuple_(Class.university_id, Class.name).in_([(uni, name) for _, name, uni, _ in chunk]))
+    ).all())
+
+    classes, links = [], []
+    for line, name, university_id, tag_ids in chunk:
+        if (university_id, name) in taken:
+            fail(line, f"A class named {name!r} already exists in the university")
+            continue
+        taken.add((university_id, name))
+        class_id = uuid.uuid4()
+        classes.append({"id": class_id, "name": name, "university_id": university_id})
+        links += [{"class_id": class_id, "tag_id": tag_id} for tag_id in tag_ids]
+
+    if not classes:
+        return
+    # executemany: one statement per table for the whole chunk (counter triggers still fire per row)
+    db.session.execute(insert(Class), classes)
+    if links:
+        db.session.execute(insert(class_tag), links)
+    class_ids = [c["id"] for c in classes]
+    if not group:
+        enqueue_grouping_many(class_ids)
+    db.session.commit()
+    stats["imported"] += len(classes)
+
+    if not group:
+        stats["queued"] += len(class_ids)
+        return
+    try:
+        with grouping_batch():
+            for class_obj in Class.query.filter(Class.id.in_(class_ids)).options(selectinload(Class.tags)).all():
+                assign_class_to_group(class_obj)
+        stats["grouped"] += len(class_ids)
+    except Exception:
+        # the classes are in; leave their grouping to the worker (and its retries)
+        logger.exception("Grouping %d imported classes failed; queued them instead", len(class_ids))
+        enqueue_grouping_many(class_ids)
+        db.session.commit()
+        stats["queued"] += len(class_ids)
+    finally:
+        db.session.expunge_all()
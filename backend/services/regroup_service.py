@@ -0,0 +1,107 @@
+# services/regroup_service.py
+import time
+import uuid
+from collections import Counter
+from flask import current_app
+from sqlalchemy import insert, update, delete
+from models import db, Class, Tag, class_tag, ClassGroup, ClassGroupMap
+from services.grouping_service import insert_group_index, _label_from_tokens
+from utils.grouping import make_signature, normalize_tokens, cluster_records
+
+def regroup_all(threshold: float = 0.6, workers: int | None = None) -> dict:
+    """Recluster the whole catalogue in one pass and rewrite groups, mappings and class FKs.
+
+    Classes join the same group when their token Jaccard reaches ``threshold``
+    (transitively) or their signatures match. Each cluster keeps the group
+    most of its members are already in (or the one matching its most common
+    signature), so ids and hand-edited names survive; groups left without
+    members are removed. ``workers`` (default REGROUP_WORKERS) > 1 scores
+    token blocks in a process pool; the result is identical either way.
+    """
+    started = time.perf_counter()
+
+    classes = db.session.query(Class.id, Class.name, Class.class_group_id).order_by(Class.id).all()
+    tag_names: dict = {}
+    for class_id, name in db.session.query(class_tag.c.class_id, Tag.name).join(Tag, Tag.id == class_tag.c.tag_id):
+        tag_names.setdefault(class_id, []).append(name)
+
+    records, signatures = [], []
+    for c in classes:
+        tags = tag_names.get(c.id, [])
+        records.append(set(normalize_tokens(c.name, tags)))
+        signatures.append(make_signature(c.name, tags))
+    if workers is None:
+        workers = current_app.config.get("REGROUP_WORKERS", 1)
+    roots = cluster_records(records, signatures, threshold, workers)
+
+    clusters: dict[int, list[int]] = {}
+    for i, root in enumerate(roots):
+        clusters.setdefault(root, []).append(i)
+
+    existing = {sig: gid for gid, sig in db.session.query(ClassGroup.id, ClassGroup.signature)}
+    had_members = {gid for (gid,) in db.session.query(ClassGroupMap.group_id).distinct()}
+
+    new_groups, assignment, claimed = [], {}, set()
+    for members in sorted(clusters.values(), key=lambda m: (-len(m), m[0])):
+        group_id = _claim_group(members, classes, signatures, existing, claimed, new_groups)
+        claimed.add(group_id)
+        for i in members:
+            assignment[classes[i].id] = group_id
+
+    if new_groups:
+        db.session.execute(insert(ClassGroup), new_groups)
+        insert_group_index([(g["id"], g["signature"]) for g in new_groups])
+
+    moved = [
+        {"id": c.id, "class_group_id": assignment[c.id]}
+        for c in classes if c.class_group_id != assignment[c.id]
+    ]
+    if moved:
+        db.session.execute(update(Class), moved)
+
+    db.session.execute(delete(ClassGroupMap))
+    if assignment:
+        db.session.execute(
+            insert(ClassGroupMap),
+            [{"id": uuid.uuid4(), "class_id": cid, "group_id": gid} for cid, gid in assignment.items()],
+        )
+
+    stale = sorted(had_members - set(assignment.values()))
+    for start in range(0, len(stale), 500):
+        db.session.execute(delete(ClassGroup).where(ClassGroup.id.in_(stale[start:start + 500])))
+
+    db.session.commit()
+    return {
+        "classes": len(classes),
+        "groups": len(clusters),
+        "groups_created": len(new_groups),
+        "groups_removed": len(stale),
+        "classes_moved": len(moved),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+def _claim_group(members, classes, signatures, existing, claimed, new_groups):
+    """Pick the group a cluster should live in, creating one if needed."""
+    current = Counter(classes[i].class_group_id for i in members if classes[i].class_group_id)
+    for group_id in sorted(current, key=lambda g: (-current[g], str(g))):
+        if group_id not in claimed:
+            return group_id
+
+    counts = Counter(signatures[i] for i in members)
+    ranked = sorted(counts, key=lambda s: (-counts[s], s))
+    for sig in ranked:
+        if existing.get(sig) not in claimed:
+            if sig in existing:
+                return existing[sig]
+            break
+    else:
+        # every signature belongs to a group another cluster kept;
+        # signatures are unique, so disambiguate the new one
+        sig = None
+
+    group_id = uuid.uuid4()
+    sig = sig or f"{ranked[0]}-{group_id.hex[:6]}"
+    label = _label_from_tokens(sig.split("-"))
+    new_groups.append({"id": group_id, "name": label, "signature": sig, "label": label})
+    existing[sig] = group_id
+    return group_id
@@ -0,0 +1,263 @@
+# services/search_service.py
+import re
+import uuid
+from sqlalchemy import event, false, text
+from models import db, Discussion, Reply, Class, University, User
+import loaders
+
+# External-content FTS5 indexes: word indexes over discussion.title/body and
+# reply.body, and trigram (substring) indexes over class, university and user
+# names. They hold only the inverted index; text is read back from the source
+# tables by rowid, and triggers keep the index in step with writes.
+# VACUUM can renumber the implicit rowids of these tables: run `flask search-reindex` after one.
+SEARCH_DDL = {
+    "discussion": [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS discussion_fts USING fts5(
+            title, body, content='discussion', content_rowid='rowid',
+            tokenize='porter unicode61 remove_diacritics 2')""",
+        """CREATE TRIGGER IF NOT EXISTS discussion_fts_ai AFTER INSERT ON discussion BEGIN
+            INSERT INTO discussion_fts(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS discussion_fts_ad AFTER DELETE ON discussion BEGIN
+            INSERT INTO discussion_fts(discussion_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS discussion_fts_au AFTER UPDATE OF title, body ON discussion BEGIN
+            INSERT INTO discussion_fts(discussion_fts, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+            INSERT INTO discussion_fts(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+        END""",
+    ],
+    "reply": [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS reply_fts USING fts5(
+            body, content='reply', content_rowid='rowid',
+            tokenize='porter unicode61 remove_diacritics 2')""",
+        """CREATE TRIGGER IF NOT EXISTS reply_fts_ai AFTER INSERT ON reply BEGIN
+            INSERT INTO reply_fts(rowid, body) VALUES (new.rowid, new.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS reply_fts_ad AFTER DELETE ON reply BEGIN
+            INSERT INTO reply_fts(reply_fts, rowid, body) VALUES ('delete', old.rowid, old.body);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS reply_fts_au AFTER UPDATE OF body ON reply BEGIN
+            INSERT INTO reply_fts(reply_fts, rowid, body) VALUES ('delete', old.rowid, old.body);
+            INSERT INTO reply_fts(rowid, body) VALUES (new.rowid, new.body);
+        END""",
+    ],
+}
+
+# source table -> FTS table, for every index above and below
+FTS_TABLES = {"discussion": "discussion_fts", "reply": "reply_fts"}
+
+
+def _name_index_ddl(table: str, fts: str) -> list[str]:
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            name, content='{table}', content_rowid='rowid', tokenize='trigram')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table}" BEGIN
+            INSERT INTO {fts}(rowid, name) VALUES (new.rowid, new.name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table}" BEGIN
+            INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.rowid, old.name);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name ON "{table}" BEGIN
+            INSERT INTO {fts}({fts}, rowid, name) VALUES ('delete', old.rowid, old.name);
+            INSERT INTO {fts}(rowid, name) VALUES (new.rowid, new.name);
+        END""",
+    ]
+
+
+# typeahead kind -> (model, trigram FTS table)
+TYPEAHEAD_SOURCES = {
+    "class": (Class, "class_name_fts"),
+    "university": (University, "university_name_fts"),
+    "user": (User, "user_name_fts"),
+}
+for _model, _fts in TYPEAHEAD_SOURCES.values():
+    SEARCH_DDL[_model.__tablename__] = _name_index_ddl(_model.__tablename__, _fts)
+    FTS_TABLES[_model.__tablename__] = _fts
+
+# Trigram indexes can't match fewer than 3 characters
+TRIGRAM_MIN_LENGTH = 3
+# Substring matches re-ranked per kind; FTS returns them unordered, which keeps a
+# very common trigram as cheap as a rare one
+TYPEAHEAD_POOL = 200
+
+# Title matches weigh more than body matches
+DISCUSSION_WEIGHTS = "10.0, 1.0"
+SNIPPET_TOKENS = 12
+
+
+def install_search_index(connection, tables=tuple(SEARCH_DDL)):
+    """Create the FTS tables and sync triggers (no-op when present)."""
+    for table in tables:
+        for statement in SEARCH_DDL[table]:
+            connection.execute(text(statement))
+
+
+def search_index_missing(connection) -> bool:
+    names = ", ".join(f"'{fts}'" for fts in FTS_TABLES.values())
+    found = connection.execute(text(f"SELECT count(*) FROM sqlite_master WHERE name IN ({names})")).scalar()
+    return found < len(FTS_TABLES)
+
+
+def rebuild_search_index(connection):
+    """Re-read every source table into its FTS index."""
+    for fts in FTS_TABLES.values():
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def _create_fts(target, connection, **kw):
+    install_search_index(connection, [target.name])
+
+
+def _drop_fts(target, connection, **kw):
+    connection.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLES[target.name]}"))
+
+
+for _model in (Discussion, Reply, Class, University, User):
+    event.listen(_model.__table__, "after_create", _create_fts)
+    event.listen(_model.__table__, "before_drop", _drop_fts)
+
+
+def fts_query(q: str) -> str | None:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix.
+
+    Quoting each word keeps FTS5 operators and punctuation in user input
+    from being parsed as query syntax. Returns None when ``q`` has no words.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def discussion_text_filter(q: str):
+    """WHERE clause for discussions whose title or body matches ``q`` (see fts_query)."""
+    match = fts_query(q)
+    if match is None:
+        return false()
+    return text(
+        "discussion.rowid IN (SELECT rowid FROM discussion_fts WHERE discussion_fts MATCH :fts_q)"
+    ).bindparams(fts_q=match)
+
+
+def search_discussions(q: str, limit: int = 20, offset: int = 0) -> list[dict]:
+    """Discussions matching ``q`` in their title, body or replies, best BM25 rank first.
+
+    Each hit carries a highlighted snippet from the best-matching text and
+    whether it came from the discussion itself or one of its replies.
+    """
+    match = fts_query(q)
+    if match is None:
+        return []
+
+    # Rank first; snippets are only built for the page being returned
+    ranked = db.session.execute(
+        text(f"""
+            WITH hits AS (
+                SELECT d.id AS discussion_id, bm25(discussion_fts, {DISCUSSION_WEIGHTS}) AS rank,
+                       'discussion' AS source, discussion_fts.rowid AS source_rowid
+                FROM discussion_fts JOIN discussion d ON d.rowid = discussion_fts.rowid
+                WHERE discussion_fts MATCH :q
+                UNION ALL
+                SELECT r.discussion_id, bm25(reply_fts), 'reply', reply_fts.rowid
+                FROM reply_fts JOIN reply r ON r.rowid = reply_fts.rowid
+                WHERE reply_fts MATCH :q
+            )
+            SELECT discussion_id, MIN(rank) AS rank, source, source_rowid
+            FROM hits GROUP BY discussion_id
+            ORDER BY rank LIMIT :limit OFFSET :offset
+        """),
+        {"q": match, "limit": limit, "offset": offset},
+    ).all()
+    if not ranked:
+        return []
+
+    snippets = {}
+    for source, column in (("discussion", -1), ("reply", 0)):
+        rowids = [row.source_rowid for row in ranked if row.source == source]
+        if not rowids:
+            continue
+        table = f"{source}_fts"
+        rows = db.session.execute(
+            text(
+                f"SELECT rowid, snippet({table}, {column}, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) "
+                f"FROM {table} WHERE {table} MATCH :q AND rowid IN ({','.join(map(str, rowids))})"
+            ),
+            {"q": match},
+        )
+        snippets.update(((source, rowid), snippet) for rowid, snippet in rows)
+
+    discussion_ids = [uuid.UUID(row.discussion_id) for row in ranked]
+    discussions = {
+        d.id: d
+        for d in Discussion.query.options(*loaders.DISCUSSION.options(exclude=("replies",)))
+        .filter(Discussion.id.in_(discussion_ids))
+    }
+    return [
+        {
+            "discussion": discussions[discussion_id],
+            "rank": row.rank,
+            "matched_in": row.source,
+            "snippet": snippets.get((row.source, row.source_rowid), ""),
+        }
+        for discussion_id, row in zip(discussion_ids, ranked)
+        if discussion_id in discussions
+    ]
+
+
+def name_filter(model, q: str):
+    """WHERE clause for a case-insensitive substring match on ``model.name``.
+
+    Uses the trigram index once ``q`` is long enough, otherwise falls back to ILIKE.
+    """
+    if len(q) < TRIGRAM_MIN_LENGTH:
+        return model.name.ilike(f"%{q}%")
+    fts = FTS_TABLES[model.__tablename__]
+    return text(
+        f'"{model.__tablename__}".rowid IN (SELECT rowid FROM {fts} WHERE {fts} MATCH :{fts}_q)'
+    ).bindparams(**{f"{fts}_q": _trigram_query(q)})
+
+
+def _trigram_query(q: str) -> str:
+    # one quoted phrase: matches q as a substring, FTS syntax inside is inert
+    return '"' + q.replace('"', '""') + '"'
+
+
+def typeahead(q: str, kinds: list[str], limit: int = 10) -> list[dict]:
+    """Names containing ``q`` across ``kinds``, best first.
+
+    Prefix matches (found through the NOCASE name indexes) rank ahead of
+    matches further into the name; ties go to the shorter name. Queries
+    shorter than the trigram length only return prefix matches.
+    """
+    q = q.strip()
+    if not q:
+        return []
+    needle = q.lower()
+    prefix = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    hits = {}
+    for kind in kinds:
+        model, fts = TYPEAHEAD_SOURCES[kind]
+        rows = (
+            db.session.query(model.id, model.name)
+            .filter(model.name.like(prefix, escape="\\"))
+            .order_by(db.collate(model.name, "NOCASE"))
+            .limit(limit)
+            .all()
+        )
+        if len(q) >= TRIGRAM_MIN_LENGTH:
+            rows += db.session.query(model.id, model.name).filter(
+                text(
+                    f'"{model.__tablename__}".rowid IN '
+                    f"(SELECT rowid FROM {fts} WHERE {fts} MATCH :q LIMIT :pool)"
+                ).bindparams(q=_trigram_query(q), pool=TYPEAHEAD_POOL)
+            ).all()
+        for row_id, name in rows:
+            hits[(kind, row_id)] = {"type": kind, "id": row_id, "name": name}
+
+    def score(hit):
+        name = hit["name"].lower()
+        position = name.find(needle)
+        return (position if position >= 0 else len(name), len(name), name)
+
+    return sorted(hits.values(), key=score)[:limit]
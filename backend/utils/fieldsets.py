@@ -0,0 +1,103 @@
+# utils/fieldsets.py
+from functools import lru_cache, wraps
+from flask import abort, current_app, g, jsonify, request
+from flask_smorest.utils import unpack_tuple_response, set_status_and_headers_in_response
+from marshmallow import Schema
+from marshmallow.fields import Nested, Pluck, String
+from werkzeug.wrappers import Response
+
+
+class FieldsetQuerySchema(Schema):
+    """Query args understood by @sparse_fieldset; mix into an endpoint's query schema."""
+    fields = String(metadata={"description": "Comma-separated fields to return (dotted for nested: replies.body)"})
+    exclude = String(metadata={"description": "Comma-separated fields to leave out"})
+
+
+def sparse_fieldset(schema: Schema):
+    """Let clients trim ``schema`` with ?fields= / ?exclude=.
+
+    Goes directly above the view (below @bp.response). The selection is
+    validated against the schema (unknown names, and dotted names under a
+    Pluck, which dumps a plain value, are a 400), exposed to the
+    view through requested_fields() so its loader profile skips unrequested
+    relationships, and the result is dumped with the trimmed schema.
+    Without either argument the response is untouched.
+    """
+    schema_cls, many = type(schema), schema.many
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            only, exclude = _names("fields"), _names("exclude")
+            if only is None and not exclude:
+                g.fieldset, g.fieldset_schema = {}, schema
+                return current_app.ensure_sync(view)(*args, **kwargs)
+
+            try:
+                trimmed = _trimmed_schema(schema_cls, many, only, exclude)
+            except ValueError as exc:
+                abort(400, description=str(exc))
+            g.fieldset = {
+                "only": None if only is None else {name.split(".")[0] for name in only},
+                "exclude": {name for name in exclude if "." not in name},
+            }
+            g.fieldset_schema = trimmed
+
+            result, status, headers = unpack_tuple_response(current_app.ensure_sync(view)(*args, **kwargs))
+            if isinstance(result, Response):
+                set_status_and_headers_in_response(result, status, headers)
+                return result
+            response = jsonify(trimmed.dump(result))
+            set_status_and_headers_in_response(response, status, headers)
+            return response
+        wrapper._sparse_fieldset = schema
+        return wrapper
+    return decorator
+
+
+def install_fieldset_guard(app):
+    """Answer ?fields= / ?exclude= on API GET endpoints without @sparse_fieldset with a 400 instead of ignoring them."""
+    @app.before_request
+    def _reject_unsupported_fieldset():
+        if request.method != "GET" or not request.path.startswith("/api/"):
+            return
+        view = app.view_functions.get(request.endpoint)
+        if view is None or hasattr(view, "_sparse_fieldset"):
+            return
+        if "fields" in request.args or "exclude" in request.args:
+            abort(400, description="This endpoint does not support fields= or exclude=")
+
+
+def requested_fields() -> dict:
+    """only/exclude for the current request's fieldset, as LoaderProfile.options() takes them."""
+    return dict(getattr(g, "fieldset", {}))
+
+
+def _names(arg: str) -> tuple[str, ...] | None:
+    # an empty ?fields= selects nothing in particular: same as leaving it out
+    names = tuple(sorted({name.strip() for name in request.args.get(arg, "").split(",") if name.strip()}))
+    if not names:
+        return None if arg == "fields" else ()
+    return names
+
+
+@lru_cache(maxsize=256)
+def _trimmed_schema(schema_cls, many, only, exclude) -> Schema:
+    # schemas are stateless once built: cache one per distinct selection
+    _check_names(schema_cls(many=many), (*(only or ()), *exclude))
+    return schema_cls(many=many, only=only, exclude=exclude)
+
+
+def _check_names(schema: Schema, names):
+    """ValueError unless every name exists and dotted names only run through nested objects."""
+    for name in names:
+        head, _, rest = name.partition(".")
+        field = schema.fields.get(head)
+        if field is None:
+            # marshmallow only checks nested names when it first dumps them
+            raise ValueError(f"Invalid fields for {schema}: {name!r}")
+        if not rest:
+            continue
+        if not isinstance(field, Nested) or isinstance(field, Pluck):
+            raise ValueError(f"Invalid fields for {schema}: {name!r} ({head!r} has no nested fields)")
+        _check_names(field.schema, [rest])
@@ -1,5 +1,13 @@
 # utils/grouping.py
 import re
+import math
+import random
+import hashlib
+from array import array
+from functools import lru_cache
+from itertools import chain, combinations
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 
 STOPWORDS = {
     "introduction","intro","advanced","fundamentals","to","and","of","for","the",
@@ -27,3 +35,284 @@ def jaccard(a: set[str], b: set[str]) -> float:
     if not a or not b:
         return 0.0
     return len(a & b) / len(a | b)
+
+
+# --- MinHash + banded LSH (approximate Jaccard candidates) ---
+MINHASH_PRIME = (1 << 61) - 1
+MINHASH_EMPTY = MINHASH_PRIME  # slot value for an empty token set
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+@lru_cache(maxsize=8)
+def _permutations(num_perm: int, seed: int = 1) -> tuple[tuple[int, int], ...]:
+    rng = random.Random(seed)
+    return tuple(
+        (rng.randrange(1, MINHASH_PRIME), rng.randrange(0, MINHASH_PRIME))
+        for _ in range(num_perm)
+    )
+
+def minhash(tokens: set[str], num_perm: int) -> list[int]:
+    """MinHash sketch; the share of equal slots estimates Jaccard similarity."""
+    hashes = [_hash64(t.encode()) for t in tokens]
+    if not hashes:
+        return [MINHASH_EMPTY] * num_perm
+    return [
+        min((a * h + b) % MINHASH_PRIME for h in hashes)
+        for a, b in _permutations(num_perm)
+    ]
+
+def lsh_band_keys(sketch: list[int], bands: int, rows: int) -> list[int]:
+    """One bucket key per band; sketches sharing any key are candidates."""
+    keys = []
+    for i in range(bands):
+        band = array("Q", [i] + sketch[i * rows:(i + 1) * rows])
+        keys.append(_hash64(band.tobytes()) >> 1)  # fits a signed 64-bit column
+    return keys
+
+def pack_sketch(sketch: list[int]) -> bytes:
+    return array("Q", sketch).tobytes()
+
+
+# --- Bulk clustering ---
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # smaller index wins so roots don't depend on union order
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+
+# Below this many distinct records a process pool costs more than it saves.
+PARALLEL_MIN_RECORDS = 5000
+
+# Records above this size are too costly to enumerate subsets for and are
+# joined by comparing against the records they share a token with instead.
+SUBSET_JOIN_MAX_SIZE = 16
+
+
+def cluster_records(records: list[set[str]], signatures: list[str], threshold: float,
+                    workers: int = 1) -> list[int]:
+    """Union-find clustering: records join when jaccard >= threshold or their signatures match.
+
+    Returns the root index for each record; roots are the smallest member
+    index, so the result only depends on the input order -- not on
+    ``workers``, which spreads the similarity join over a process pool.
+    """
+    uf = UnionFind(len(records))
+    first_with_sig: dict[str, int] = {}
+    for i, sig in enumerate(signatures):
+        uf.union(first_with_sig.setdefault(sig, i), i)
+
+    distinct, members = _dedupe(records)
+    if workers > 1 and len(distinct) >= PARALLEL_MIN_RECORDS:
+        edges = _parallel_forest(distinct, threshold, workers)
+    else:
+        edges = similarity_forest(distinct, threshold)
+    for i, j in edges:
+        uf.union(members[i][0], members[j][0])
+    for same in members:
+        for k in same[1:]:
+            uf.union(same[0], k)
+    return [uf.find(i) for i in range(len(records))]
+
+
+def similarity_forest(records: list[tuple[int, ...]], threshold: float,
+                      block: range | None = None) -> list[tuple[int, int]]:
+    """Spanning-forest edges of the graph linking records with jaccard >= threshold.
+
+    ``records`` are sorted tuples of token ids. Two sets of sizes s and m
+    reach the threshold exactly when they share o = ceil(t(s+m)/(1+t))
+    tokens, so every o-subset of a record is a bucket key and any two
+    records on opposite sides of a bucket are similar -- the sparse
+    record x token product without scoring pairs one by one. With
+    ``block`` only keys whose smallest token id falls in it are built,
+    which splits the join into independent pieces.
+    """
+    edges: list[tuple[int, int]] = []
+    parent: dict[int, int] = {}
+
+    def find(x: int) -> int:
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    def union(a: int, b: int):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+            edges.append((min(a, b), max(a, b)))
+
+    by_size: dict[int, list[int]] = {}
+    for i, r in enumerate(records):
+        if 0 < len(r) <= SUBSET_JOIN_MAX_SIZE and (block is None or _touches(r, block)):
+            by_size.setdefault(len(r), []).append(i)
+
+    for s in sorted(by_size):
+        for m in sorted(by_size):
+            if m < s or s < threshold * m - 1e-9:
+                continue
+            o = min_overlap(s, m, threshold)
+            if o > s:
+                continue
+            if m == s:
+                first: dict[tuple, int] = {}
+                for i in by_size[s]:
+                    for key in _subset_keys(records[i], o, block):
+                        j = first.setdefault(key, i)
+                        if j != i:
+                            union(j, i)
+                continue
+            # opposite sides only: every size-s record in a bucket is
+            # similar to every size-m record in it
+            pending: dict[tuple, list[int]] = {}
+            for i in by_size[s]:
+                for key in _subset_keys(records[i], o, block):
+                    pending.setdefault(key, []).append(i)
+            for i in by_size[m]:
+                for key in _subset_keys(records[i], o, block):
+                    ids = pending.get(key)
+                    if ids:
+                        for j in ids:
+                            union(j, i)
+                        pending[key] = ids[:1]
+
+    if block is None or block.start == 0:
+        for i, j in _large_record_pairs(records, threshold):
+            union(i, j)
+    return edges
+
+
+def min_overlap(s: int, m: int, threshold: float) -> int:
+    """Smallest intersection for which sets of sizes s and m reach threshold Jaccard."""
+    return max(1, math.ceil(threshold * (s + m) / (1 + threshold) - 1e-9))
+
+
+def _subset_keys(record: tuple[int, ...], o: int, block: range | None):
+    if block is None:
+        return combinations(record, o)
+    return _block_subset_keys(record, o, block)
+
+
+def _block_subset_keys(record: tuple[int, ...], o: int, block: range):
+    # keys whose smallest token lies in the block: that token plus any
+    # (o - 1)-subset of the tokens after it
+    lo, hi = bisect_left(record, block.start), bisect_left(record, block.stop)
+    return chain.from_iterable(
+        map((record[p],).__add__, combinations(record[p + 1:], o - 1))
+        for p in range(lo, hi)
+    )
+
+
+def _large_record_pairs(records: list[tuple[int, ...]], threshold: float) -> list[tuple[int, int]]:
+    """Similar pairs involving a record too large for the subset join."""
+    large = {i for i, r in enumerate(records) if len(r) > SUBSET_JOIN_MAX_SIZE}
+    if not large:
+        return []
+    min_size = threshold * (SUBSET_JOIN_MAX_SIZE + 1)
+    postings: dict[int, list[int]] = {}
+    for i, r in enumerate(records):
+        if len(r) >= min_size - 1e-9:
+            for t in r:
+                postings.setdefault(t, []).append(i)
+    pairs = []
+    for i in sorted(large):
+        a = set(records[i])
+        seen = {i}
+        for t in records[i]:
+            for j in postings.get(t, ()):
+                if j in seen or (j in large and j < i):
+                    continue
+                seen.add(j)
+                if jaccard(a, set(records[j])) >= threshold:
+                    pairs.append((i, j))
+    return pairs
+
+
+def _touches(record: tuple[int, ...], block: range) -> bool:
+    k = bisect_left(record, block.start)
+    return k < len(record) and record[k] < block.stop
+
+
+def _parallel_forest(records: list[tuple[int, ...]], threshold: float, workers: int) -> list[tuple[int, int]]:
+    """Run similarity_forest over token blocks in a process pool and merge the edges.
+
+    Every bucket key belongs to exactly one block (the one holding its
+    smallest token), so the union of the per-block forests connects the
+    same records as a single-process run. Results are merged in block
+    order, keeping the output deterministic.
+    """
+    blocks = _token_blocks(records, threshold, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(records, threshold)) as pool:
+        # heaviest blocks first so no straggler starts last
+        order = sorted(range(len(blocks)), key=lambda k: -blocks[k][1])
+        futures = {k: pool.submit(_forest_for_block, blocks[k][0]) for k in order}
+        parts = [futures[k].result() for k in range(len(blocks))]
+    return [edge for part in parts for edge in part]
+
+
+def _token_blocks(records: list[tuple[int, ...]], threshold: float, count: int) -> list[tuple[range, int]]:
+    """Split the token id space into contiguous blocks of roughly equal join work.
+
+    Returns (block, estimated cost) pairs in token order.
+    """
+    vocab_size = max((r[-1] for r in records if r), default=-1) + 1
+    sizes = {len(r) for r in records if 0 < len(r) <= SUBSET_JOIN_MAX_SIZE}
+    overlaps = {
+        s: [min_overlap(s, m, threshold) for m in sizes if threshold * max(s, m) <= min(s, m) + 1e-9]
+        for s in sizes
+    }
+    cost = [0] * vocab_size
+    for r in records:
+        for o in overlaps.get(len(r), ()):
+            for p, t in enumerate(r):
+                cost[t] += math.comb(len(r) - p - 1, o - 1)
+    target = sum(cost) / count if count else 0
+    blocks, start, acc = [], 0, 0
+    for t, c in enumerate(cost):
+        acc += c
+        if acc >= target and len(blocks) < count - 1:
+            blocks.append((range(start, t + 1), acc))
+            start, acc = t + 1, 0
+    blocks.append((range(start, max(vocab_size, start + 1)), acc))
+    return blocks
+
+
+_worker_records: list[tuple[int, ...]] = []
+_worker_threshold = 0.0
+
+
+def _init_worker(records: list[tuple[int, ...]], threshold: float):
+    global _worker_records, _worker_threshold
+    _worker_records, _worker_threshold = records, threshold
+
+
+def _forest_for_block(block: range) -> list[tuple[int, int]]:
+    return similarity_forest(_worker_records, _worker_threshold, block)
+
+
+def _dedupe(records: list[set[str]]) -> tuple[list[tuple[int, ...]], list[list[int]]]:
+    """Collapse identical token sets and map tokens to ids, rarest token first."""
+    df: dict[str, int] = {}
+    for r in records:
+        for t in r:
+            df[t] = df.get(t, 0) + 1
+    vocab = {t: n for n, t in enumerate(sorted(df, key=lambda t: (df[t], t)))}
+    distinct: dict[tuple[int, ...], list[int]] = {}
+    for i, r in enumerate(records):
+        distinct.setdefault(tuple(sorted(vocab[t] for t in r)), []).append(i)
+    return list(distinct), list(distinct.values())
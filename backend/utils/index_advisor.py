@@ -0,0 +1,51 @@
+# utils/index_advisor.py
+import re
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.query_budget import fingerprint
+
+# "SCAN classes" is a full table scan; "SCAN classes USING [COVERING] INDEX ix" walks an index in order
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+_TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (.+)$")
+
+
+@contextmanager
+def capture_selects():
+    """Collect the distinct SELECT statements (with their first parameters) run on any engine."""
+    statements = {}
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")) and not executemany:
+            statements.setdefault(fingerprint(statement), (statement, parameters))
+
+    event.listen(Engine, "before_cursor_execute", _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", _capture)
+
+
+def explain(connection, statement: str, parameters) -> list[str]:
+    """EXPLAIN QUERY PLAN detail lines, indented by nesting depth."""
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node] + detail)
+    return lines
+
+
+def plan_findings(plan: list[str], tables) -> list[str]:
+    """Full scans of ``tables`` and temp B-tree sorts in a query plan."""
+    findings = []
+    for line in plan:
+        detail = line.strip()
+        scan = _FULL_SCAN.match(detail)
+        if scan and scan.group(1) in tables:
+            findings.append(f"full scan of {scan.group(1)}")
+        sort = _TEMP_SORT.search(detail)
+        if sort:
+            findings.append(f"temp b-tree for {sort.group(1)}")
+    return findings
@@ -0,0 +1,66 @@
+# utils/pagination.py
+import base64
+import datetime
+import json
+import uuid
+from flask import abort
+from sqlalchemy import tuple_
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_value, row_id: uuid.UUID) -> str:
+    """Opaque token for the (sort key, id) position of the last row on a page."""
+    if isinstance(sort_value, datetime.datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id.hex]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort_type=datetime.datetime) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+        if sort_type is datetime.datetime:
+            sort_value = datetime.datetime.fromisoformat(sort_value)
+        elif not isinstance(sort_value, sort_type):
+            raise TypeError(sort_value)
+        if not isinstance(row_id, str):
+            raise TypeError(row_id)
+        return sort_value, uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        abort(400, description="Invalid cursor")
+
+
+def keyset_page(query, sort_col, id_col, limit: int | None, cursor: str | None = None, descending: bool = False):
+    """Order ``query`` by (sort_col, id_col) and return (rows, next_cursor).
+
+    Rows after ``cursor`` are found with a range seek on a composite
+    (sort key, id) index, so page N costs the same as page 1. The sort key
+    is usually created_at; any unique-enough column works (e.g. a name).
+    Without a limit every remaining row is returned and next_cursor is None.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor, sort_col.type.python_type)
+        key = tuple_(sort_col, id_col)
+        query = query.filter(key < (sort_value, row_id) if descending else key > (sort_value, row_id))
+
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+
+    if limit is None:
+        return query.all(), None
+
+    # One extra row tells us whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_col.key), last.id)
+
+
+def pagination_header(limit: int | None, next_cursor: str | None) -> dict:
+    return {"X-Pagination": json.dumps({"limit": limit, "next_cursor": next_cursor})}
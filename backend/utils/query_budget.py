@@ -0,0 +1,102 @@
+# utils/query_budget.py
+import logging
+import os
+import re
+import traceback
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# A statement repeated more often than this within one request is reported as an N+1
+DEFAULT_REPEAT_LIMIT = 3
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more SQL statements than its endpoint's budget allows."""
+
+
+def query_budget(statements: int | None = None, repeats: int | None = DEFAULT_REPEAT_LIMIT):
+    """Declare how many SQL statements a view may run per request.
+
+    ``repeats`` caps how often one statement fingerprint may recur (None: no cap).
+    Place it directly above the ``def`` so the route decorators carry it along.
+    """
+    def decorator(view):
+        view._query_budget = (statements, repeats)
+        return view
+    return decorator
+
+
+def fingerprint(statement: str) -> str:
+    """Statement text with parameters and literals folded, so per-row repeats compare equal."""
+    s = re.sub(r"'(?:[^']|'')*'", "?", statement)
+    s = re.sub(r"\b\d+(\.\d+)?\b", "?", s)
+    s = re.sub(r"\(\s*\?(\s*,\s*\?)*\s*\)", "(?)", s)
+    s = re.sub(r"__\[POSTCOMPILE_\w+\]", "(?)", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def install_query_budget(app):
+    """Count statements per request and enforce the budgets declared with @query_budget.
+
+    Mode comes from app.config["QUERY_BUDGET"]: "off", "warn" (log the
+    offending statement and stack) or "raise" (fail the request with
+    QueryBudgetExceeded, for test runs). In warn/raise mode every response
+    carries an X-Query-Count header. Statements are counted on every engine
+    (the production profile reads through a separate read-only one).
+    """
+    if app.config.get("QUERY_BUDGET", "off") == "off":
+        return
+
+    @app.before_request
+    def _start_tracking():
+        view = app.view_functions.get(request.endpoint)
+        g.query_budget = getattr(view, "_query_budget", (None, DEFAULT_REPEAT_LIMIT))
+        g.query_count = 0
+        g.query_fingerprints = Counter()
+
+    @app.after_request
+    def _report_count(response):
+        if "query_count" in g:
+            response.headers["X-Query-Count"] = str(g.query_count)
+        return response
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _count_statement(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context() or "query_count" not in g:
+            return
+        g.query_count += 1
+        key = fingerprint(statement)
+        g.query_fingerprints[key] += 1
+
+        budget, repeats = g.query_budget
+        if budget is not None and g.query_count == budget + 1:
+            _violation(f"{request.method} {request.path} ran more than {budget} SQL statements", statement)
+        if repeats is not None and g.query_fingerprints[key] == repeats + 1:
+            _violation(f"{request.method} {request.path} repeated a statement more than {repeats} times (N+1?)", statement)
+
+
+def lift_query_budget():
+    """Stop enforcing the current request's budget (e.g. a streamed list that queries per chunk)."""
+    if "query_budget" in g:
+        g.query_budget = (None, None)
+
+
+def _violation(summary: str, statement: str):
+    stack = "".join(traceback.format_list(_caller_frames()))
+    message = f"{summary}\nStatement: {statement}\nIssued from:\n{stack}"
+    if current_app.config.get("QUERY_BUDGET") == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _caller_frames(limit: int = 15):
+    # innermost frames outside SQLAlchemy: the route / schema field / service that issued the query
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if f"{os.sep}sqlalchemy{os.sep}" not in frame.filename
+    ]
+    return frames[-limit:]
@@ -0,0 +1,14 @@
+# utils/request_args.py
+import uuid
+from flask import abort, request
+
+
+def uuid_arg(name: str) -> uuid.UUID | None:
+    """The ``name`` query arg as a UUID (None when absent or empty); anything else is a 400."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        abort(400, description=f"{name} must be a UUID")
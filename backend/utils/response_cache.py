@@ -0,0 +1,141 @@
+# utils/response_cache.py
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from utils.single_flight import SingleFlight
+from utils.table_versions import table_versions
+
+
+class _Entry:
+    def __init__(self, tables, versions, expires_at, status, headers, body):
+        self.tables, self.versions, self.expires_at = tables, versions, expires_at
+        self.status, self.headers, self.body = status, headers, body
+        self.size = len(body) + sum(len(k) + len(v) for k, v in headers)
+
+
+class ResponseCache:
+    """Serialized GET responses in memory, LRU within a byte budget, each with a TTL.
+
+    An entry remembers the versions of the tables it was built from: a
+    commit touching one of them drops it (and a version mismatch on lookup
+    catches a commit that raced with building it).
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = dict.fromkeys(("hits", "misses", "expired", "evicted", "invalidated"), 0)
+        table_versions.on_bump(self.invalidate)
+
+    def get(self, key, tables) -> _Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expired = entry.expires_at <= time.monotonic()
+            if expired or entry.versions != table_versions.get(tables):
+                self._drop(key)
+                self.stats["expired" if expired else "invalidated"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key, entry: _Entry, max_bytes: int):
+        if entry.size > max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats["evicted"] += 1
+
+    def invalidate(self, tables):
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if not tables.isdisjoint(entry.tables)]
+            for key in stale:
+                self._drop(key)
+            self.stats["invalidated"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": current_app.config["RESPONSE_CACHE_BYTES"],
+                "coalesced": in_flight.coalesced,
+            }
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key).size
+
+
+response_cache = ResponseCache()
+in_flight = SingleFlight()
+
+# seconds a request waits on an identical in-flight one before computing its own response
+COALESCE_TIMEOUT = 30
+
+
+def cached(*tables: str, ttl: int | None = None):
+    """Serve a GET view from ``response_cache`` until ``ttl`` seconds pass or ``tables`` change.
+
+    Keyed on the path and the sorted query args. Goes directly below
+    @bp.route so the stored response is the fully serialized one; the
+    ETag set by @conditional is kept, so cached hits still answer 304.
+    Concurrent misses for one key run the view once (single flight) and
+    share its response.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            config = current_app.config
+            if not config["RESPONSE_CACHE"]:
+                return current_app.ensure_sync(view)(*args, **kwargs)
+
+            key = (request.path, tuple(sorted(request.args.items(multi=True))))
+            entry = response_cache.get(key, tables)
+            if entry is None:
+                own = {}
+
+                def render():
+                    versions = table_versions.get(tables)
+                    response = own["response"] = current_app.make_response(
+                        current_app.ensure_sync(view)(*args, **kwargs)
+                    )
+                    if response.status_code != 200 or response.is_streamed:
+                        return None
+                    fresh = _Entry(
+                        tables, versions, time.monotonic() + (config["RESPONSE_CACHE_TTL"] if ttl is None else ttl),
+                        response.status_code, list(response.headers.items()), response.get_data(),
+                    )
+                    response_cache.put(key, fresh, config["RESPONSE_CACHE_BYTES"])
+                    return fresh
+
+                entry = in_flight.do(key, render, timeout=COALESCE_TIMEOUT)
+                if "response" in own:
+                    return own["response"]
+                if entry is None:
+                    # the shared run produced nothing reusable (e.g. a 304 for its own client)
+                    return current_app.ensure_sync(view)(*args, **kwargs)
+
+            response = current_app.response_class(entry.body, status=entry.status, headers=entry.headers)
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
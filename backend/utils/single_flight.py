@@ -0,0 +1,47 @@
+# utils/single_flight.py
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.ok = False
+        self.result = None
+
+
+class SingleFlight:
+    """At most one execution per key at a time; concurrent callers for that key share its result.
+
+    A caller that arrives while the key is in flight waits for the
+    leader instead of running ``fn`` itself. If the leader fails, or does
+    not finish within ``timeout`` seconds, waiters fall back to running
+    ``fn`` on their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout: float | None = None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(timeout) and call.ok:
+                with self._lock:
+                    self.coalesced += 1
+                return call.result
+            return fn()
+
+        try:
+            call.result = fn()
+            call.ok = True
+            return call.result
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
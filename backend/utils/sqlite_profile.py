@@ -0,0 +1,75 @@
+# utils/sqlite_profile.py
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+
+# Flask-SQLAlchemy bind key of the read-only engine (production profile only)
+READ_BIND = "reader"
+
+# Per-connection PRAGMAs for each SQLITE_PROFILE (foreign_keys is always on)
+SQLITE_PROFILES = {
+    # SQLite's own defaults: rollback journal, synchronous=FULL, no busy timeout
+    "default": {},
+    "production": {
+        # with WAL, NORMAL only risks the last commits on an OS crash, never corruption
+        "synchronous": "NORMAL",
+        # wait for a lock instead of failing with "database is locked"
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        # negative: KiB, so 64 MiB of page cache per connection
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def engine_config(profile: str, db_path: str, read_pool: int) -> dict:
+    """Flask-SQLAlchemy engine settings for ``profile``.
+
+    production: the default engine becomes the single writer connection
+    (pool of one, so in-process writers queue for it rather than
+    contending for SQLite's lock), and GET/HEAD requests read through a
+    pool of read-only connections, which WAL lets run alongside the writer.
+    """
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}")
+    if profile != "production":
+        return {}
+    return {
+        "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": 1, "max_overflow": 0, "pool_timeout": 30},
+        "SQLALCHEMY_BINDS": {
+            READ_BIND: {
+                "url": f"sqlite:///file:{db_path}?mode=ro&uri=true",
+                "pool_size": read_pool,
+                "max_overflow": 0,
+                "pool_timeout": 30,
+            },
+        },
+    }
+
+
+def apply_pragmas(dbapi_conn, profile: str):
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    for pragma, value in SQLITE_PROFILES[profile].items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+class ReadRoutingSession(Session):
+    """db.session that sends reads made while serving GET/HEAD to the read-only bind.
+
+    Everything else (writes, flushes, background workers, CLI commands)
+    uses the default engine. A GET handler that tries to write fails with
+    "attempt to write a readonly database".
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and request.method in ("GET", "HEAD")
+            and READ_BIND in self._db.engines
+        ):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
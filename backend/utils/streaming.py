@@ -0,0 +1,67 @@
+# utils/streaming.py
+from functools import wraps
+from flask import current_app, g, request, stream_with_context
+from flask_sqlalchemy.query import Query
+from marshmallow import Schema
+from marshmallow.fields import Boolean
+from utils.query_budget import lift_query_budget
+
+# rows loaded (and serialized) per round trip of a streamed list
+STREAM_CHUNK = 500
+
+
+class StreamQuerySchema(Schema):
+    """Query arg understood by @streamable; mix into an endpoint's query schema."""
+    stream = Boolean(metadata={"description": "Send the list as a chunked stream (same JSON, sent as it is built)"})
+
+
+def streamable(chunk_size: int = STREAM_CHUNK):
+    """Opt-in streaming for a list view: ?stream=true.
+
+    The view returns an unexecuted Query. Normally it is run with .all()
+    and dumped as before; when streaming, it is read ``chunk_size`` rows
+    at a time (yield_per) and each chunk is dumped and sent as part of one
+    JSON array, so neither the rows nor the output are held in memory at
+    once. Goes directly below @sparse_fieldset, whose (trimmed) schema it
+    dumps with. Loader queries run once per chunk, so a streamed request
+    has no statement budget.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            result = current_app.ensure_sync(view)(*args, **kwargs)
+            if not isinstance(result, Query):
+                return result
+            if not _stream_requested():
+                return result.all()
+            lift_query_budget()
+            body = _json_array(result.yield_per(chunk_size), g.fieldset_schema, chunk_size)
+            return current_app.response_class(stream_with_context(body), mimetype="application/json")
+        return wrapper
+    return decorator
+
+
+def _stream_requested() -> bool:
+    return request.args.get("stream", "").lower() in ("1", "true")
+
+
+def _json_array(rows, schema: Schema, chunk_size: int):
+    # same bytes as jsonify(schema.dump(rows)) in non-debug mode: compact, sorted keys, trailing newline
+    dumps = current_app.json.dumps
+    yield "["
+    separator = ""
+    for chunk in _chunks(rows, chunk_size):
+        yield separator + ",".join(dumps(item, separators=(",", ":")) for item in schema.dump(chunk))
+        separator = ","
+    yield "]\n"
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,143 @@
+# utils/table_versions.py
+import secrets
+import threading
+from functools import wraps
+from flask import current_app, request
+from flask_smorest.utils import unpack_tuple_response, set_status_and_headers_in_response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from werkzeug.wrappers import Response
+
+
+class TableVersions:
+    """In-process version counter per table, bumped when a session commits writes to it.
+
+    Writes are collected from ORM flushes and from insert/update/delete
+    statements executed through a session, then widened to the tables
+    that ON DELETE actions and database triggers change as a side effect.
+    Counters start at 0 in each process, so ETags also carry a random
+    per-process epoch.
+
+    Writes made by another process (a ``flask`` CLI command, a second
+    server worker) are not seen: run the API as one process, or turn
+    ETAGS off.
+    """
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._cascades = {}
+        self._triggers = {}
+        self._listeners = []
+
+    def get(self, tables) -> tuple[int, ...]:
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, written, deleted=()):
+        tables = set(written) | self._cascaded(deleted)
+        # trigger writes are counter/summary UPDATEs, which fire no further triggers
+        tables |= {target for table in tables for target in self._triggers.get(table, ())}
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+        for listener in self._listeners:
+            listener(tables)
+
+    def on_bump(self, listener):
+        """Call ``listener(tables)`` after every bump (e.g. to drop cached responses)."""
+        self._listeners.append(listener)
+
+    def _cascaded(self, deleted) -> set[str]:
+        # rows removed or nulled out by ON DELETE, transitively
+        seen, todo = set(), list(deleted)
+        while todo:
+            table = todo.pop()
+            if table not in seen:
+                seen.add(table)
+                todo.extend(self._cascades.get(table, ()))
+        return seen
+
+
+table_versions = TableVersions()
+
+
+def install_table_versions(metadata, trigger_writes: dict[str, set[str]] = None):
+    """Bump ``table_versions`` on every session commit.
+
+    ``trigger_writes`` maps a table to the tables its triggers update; the
+    ON DELETE CASCADE / SET NULL edges are read from ``metadata``.
+    """
+    table_versions._triggers = dict(trigger_writes or {})
+    for table in metadata.tables.values():
+        for fk in table.foreign_keys:
+            if fk.ondelete:
+                table_versions._cascades.setdefault(fk.column.table.name, set()).add(table.name)
+
+    event.listen(Session, "after_flush", _collect_flush)
+    event.listen(Session, "do_orm_execute", _collect_statement)
+    event.listen(Session, "after_commit", _publish)
+    event.listen(Session, "after_rollback", _discard)
+
+
+def conditional(*tables: str):
+    """Conditional GET for a view whose response depends only on ``tables``.
+
+    The ETag is built from those tables' versions, so a matching
+    If-None-Match is answered with 304 before the view (or any query)
+    runs. Goes below @bp.response, above @sparse_fieldset.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("ETAGS", True):
+                return current_app.ensure_sync(view)(*args, **kwargs)
+
+            etag = "-".join([table_versions.epoch, *map(str, table_versions.get(tables))])
+            headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+            if etag in request.if_none_match:
+                return Response(status=304, headers=headers)
+
+            result, status, view_headers = unpack_tuple_response(current_app.ensure_sync(view)(*args, **kwargs))
+            headers = {**dict(view_headers or {}), **headers}
+            if isinstance(result, Response):
+                set_status_and_headers_in_response(result, status, headers)
+                return result
+            return result, status or 200, headers
+        return wrapper
+    return decorator
+
+
+def _pending(session, kind: str = "written") -> set[str]:
+    return session.info.setdefault(f"{kind}_tables", set())
+
+
+def _collect_flush(session, flush_context):
+    # runs while new/dirty/deleted and attribute history still describe the flush
+    for objects, kind in ((session.new, "written"), (session.dirty, "written"), (session.deleted, "deleted")):
+        for obj in objects:
+            state = inspect(obj)
+            _pending(session, kind).update(table.name for table in state.mapper.tables)
+            for rel in state.mapper.relationships:
+                # many-to-many collection changes land in the association table
+                if rel.secondary is not None and (kind == "deleted" or state.attrs[rel.key].history.has_changes()):
+                    _pending(session).add(rel.secondary.name)
+
+
+def _collect_statement(state):
+    if state.is_insert or state.is_update:
+        _pending(state.session).add(state.statement.table.name)
+    elif state.is_delete:
+        _pending(state.session, "deleted").add(state.statement.table.name)
+
+
+def _publish(session):
+    written = session.info.pop("written_tables", set())
+    deleted = session.info.pop("deleted_tables", set())
+    if written or deleted:
+        table_versions.bump(written, deleted)
+
+
+def _discard(session):
+    session.info.pop("written_tables", None)
+    session.info.pop("deleted_tables", None)